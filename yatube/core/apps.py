@@ -1,5 +1,35 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.management import call_command
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def create_cache_tables(using, **kwargs):
+    """Таблицы DatabaseCache по текущему CACHES.
+
+    Создаются после migrate, а не миграцией: их набор зависит от
+    настроек, а не от состояния миграций. У core нет моделей, и
+    post_migrate для него не приходит, поэтому обработчик слушает все
+    приложения; уже созданные таблицы createcachetable пропускает.
+    """
+    call_command('createcachetable', database=using, verbosity=0)
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import metrics
+        from .sqlite import apply_pragmas
+        from .templating import warm_up
+
+        connection_created.connect(
+            apply_pragmas, dispatch_uid='core.sqlite.apply_pragmas'
+        )
+        post_migrate.connect(
+            create_cache_tables, dispatch_uid='core.apps.create_cache_tables'
+        )
+        metrics.install()
+        if settings.TEMPLATE_CACHE:
+            warm_up()
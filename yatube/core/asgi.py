@@ -0,0 +1,206 @@
+"""ASGI-адаптер для синхронного Django.
+
+Django 2.2 не умеет асинхронные представления, поэтому обработчик
+принимает соединения в цикле событий, а сам запрос выполняет
+WSGIHandler в ограниченном пуле потоков. Медленный клиент держит
+только корутину: поток освобождается, как только ответ готов, и тело
+отдаётся клиенту уже из цикла событий.
+
+Представления, помеченные ``@read_only``, выполняются в отдельном пуле,
+поэтому долгие записи (загрузка изображений) не занимают потоки лент.
+"""
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import Resolver404, get_resolver
+
+# Тело запроса больше этого размера уходит из памяти во временный файл.
+BODY_SPOOL_SIZE = 1024 * 1024
+
+# Сколько кусков потокового ответа ждут медленного клиента.
+STREAM_QUEUE_SIZE = 8
+
+
+def read_only(view):
+    """Помечает представление, которое только читает данные."""
+    view.read_only = True
+    return view
+
+
+class AsgiHandler:
+    """ASGI 3 приложение поверх WSGIHandler."""
+
+    def __init__(self, threads=None, read_threads=None):
+        self.wsgi = WSGIHandler()
+        self.pools = {
+            'default': ThreadPoolExecutor(
+                threads or settings.ASGI_THREADS,
+                thread_name_prefix='asgi',
+            ),
+            'read': ThreadPoolExecutor(
+                read_threads or settings.ASGI_READ_THREADS,
+                thread_name_prefix='asgi-read',
+            ),
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемое соединение: {scope["type"]}')
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        pool = self.pools[self.pool_name(scope['path'])]
+        await self.respond(pool, self.environ(scope, body), send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+
+    @staticmethod
+    async def read_body(receive):
+        """Тело запроса или None, если клиент отключился раньше."""
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    @staticmethod
+    def pool_name(path):
+        try:
+            match = get_resolver().resolve(path)
+        except Resolver404:
+            return 'default'
+        return 'read' if getattr(match.func, 'read_only', False) else 'default'
+
+    @staticmethod
+    def environ(scope, body):
+        """WSGI environ из ASGI scope (PEP 3333: строки в latin-1)."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode().decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                value = f'{environ[name]},{value}'
+            environ[name] = value
+        return environ
+
+    def run(self, environ, put, stop):
+        """Выполняет запрос и передаёт сообщения ответа через ``put``.
+
+        Представление, итерация потокового ответа и его close() идут в
+        одном потоке пула: генератор ленты читает базу через соединение
+        запроса, а request_finished закрывает соединения там, где они
+        открывались. Обычный ответ уходит одним сообщением.
+        """
+        def start_response(status, headers, exc_info=None):
+            put({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [
+                    (name.lower().encode('latin-1'), value.encode('latin-1'))
+                    for name, value in headers
+                ],
+            })
+
+        try:
+            result = self.wsgi(environ, start_response)
+            try:
+                chunks = result
+                if not getattr(result, 'streaming', False):
+                    chunks = [b''.join(result)]
+                for chunk in chunks:
+                    if stop.is_set():
+                        break
+                    if chunk:
+                        put({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            finally:
+                result.close()
+        finally:
+            environ['wsgi.input'].close()
+            put(None)
+
+    async def respond(self, pool, environ, send):
+        """Отдаёт клиенту сообщения, которые ``run`` кладёт в очередь.
+
+        Обычный ответ освобождает поток сразу, потоковый занимает его,
+        пока клиент читает.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        stop = threading.Event()
+
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop).result()
+
+        producer = loop.run_in_executor(pool, self.run, environ, put, stop)
+        started = finished = False
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    finished = True
+                    break
+                started = True
+                await send(message)
+            if started:
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            stop.set()
+            while not finished:
+                finished = await queue.get() is None
+            await producer
+
+
+def get_asgi_application():
+    import django
+
+    django.setup(set_prefix=False)
+    return AsgiHandler()
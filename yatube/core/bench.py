@@ -0,0 +1,73 @@
+"""Общие помощники нагрузочных замеров: перцентили и отчёт в JSON."""
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+
+import django
+
+
+def percentile(samples, share):
+    """Перцентиль по методу ближайшего ранга; share от 0 до 100."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(math.ceil(share / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Сводка по задержкам в секундах: запросы в секунду и хвосты в мс."""
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(max(latencies, default=None)),
+    }
+
+
+def commit():
+    """Текущий коммит, чтобы сравнивать отчёты между версиями."""
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(__file__),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def report(name, params, results):
+    """Отчёт замера с параметрами и окружением."""
+    return {
+        'benchmark': name,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'params': params,
+        'results': results,
+    }
+
+
+def write_report(data, path=None, stdout=None):
+    """Пишет отчёт в файл или, без пути, в stdout."""
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+    elif stdout is not None:
+        stdout.write(text)
@@ -0,0 +1,90 @@
+"""Сборка настройки CACHES из одного URL.
+
+Модуль импортируется из settings.py, поэтому не должен зависеть
+от настроенного Django.
+"""
+from urllib.parse import urlparse
+
+BACKENDS = {
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'core.cache.redis.RedisCache',
+}
+
+# Предел записей для бэкендов, которые вытесняют записи сами (db, file,
+# locmem). При переполнении удаляется 1/CULL_FREQUENCY записей.
+MAX_ENTRIES = {
+    'default': 5000,
+    'posts': 50000,
+    'users': 5000,
+    'thumbnails': 20000,
+    'metrics': 5000,
+}
+
+DEFAULT_MAX_ENTRIES = 5000
+
+CULL_FREQUENCY = 4
+
+
+def _location(url):
+    parsed = urlparse(url)
+    if parsed.scheme == 'redis':
+        return url
+    if parsed.scheme == 'file':
+        return parsed.path
+    return parsed.netloc or parsed.path or 'yatube'
+
+
+def _namespace_location(scheme, location, namespace):
+    """Своё хранилище пространства имён: таблица, каталог или словарь.
+
+    Redis вытесняет ключи сам (maxmemory-policy), поэтому алиасы делят
+    одну базу и различаются префиксом.
+    """
+    if scheme == 'redis':
+        return location
+    if scheme == 'file':
+        return f'{location.rstrip("/")}/{namespace}'
+    return f'{location}_{namespace}'
+
+
+def _alias(scheme, name, location, version, prefix):
+    settings = {
+        'BACKEND': BACKENDS[scheme],
+        'LOCATION': location,
+        'VERSION': version,
+        'KEY_PREFIX': prefix,
+    }
+    if scheme != 'redis':
+        settings['OPTIONS'] = {
+            'MAX_ENTRIES': MAX_ENTRIES.get(name, DEFAULT_MAX_ENTRIES),
+            'CULL_FREQUENCY': CULL_FREQUENCY,
+        }
+    return settings
+
+
+def build_caches(url, version, namespaces):
+    """Возвращает CACHES: ``default`` и по алиасу на пространство имён.
+
+    У каждого алиаса свой префикс ключей и, кроме Redis, своё хранилище
+    с собственным пределом записей, поэтому вытеснение в одном
+    пространстве не задевает другие. Общая версия позволяет сбросить
+    всё при выкладке.
+    """
+    scheme = urlparse(url).scheme
+    if scheme not in BACKENDS:
+        raise ValueError(f'Неизвестная схема кеша: {url}')
+    location = _location(url)
+    caches = {
+        'default': _alias(scheme, 'default', location, version, 'yatube')
+    }
+    for namespace in namespaces:
+        caches[namespace] = _alias(
+            scheme,
+            namespace,
+            _namespace_location(scheme, location, namespace),
+            version,
+            namespace,
+        )
+    return caches
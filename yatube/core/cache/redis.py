@@ -0,0 +1,261 @@
+import pickle
+import socket
+import threading
+from urllib.parse import urlparse
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+PICKLE_MARK = b'\x80'
+
+SCAN_COUNT = 1000
+
+# incr за один атомарный шаг: отсутствующий ключ не создаётся заново
+# (без TTL), если его успели удалить или он истёк между проверкой и
+# увеличением.
+INCR_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return false"
+)
+
+
+class RedisError(Exception):
+    """Ошибка, которую вернул сервер Redis."""
+
+
+class Connection:
+    """Минимальный клиент протокола RESP поверх сокета."""
+
+    def __init__(self, host, port, db, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.file = self.sock.makefile('rb')
+        if db:
+            self.execute('SELECT', db)
+
+    @staticmethod
+    def _pack(*args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('Соединение с Redis закрыто')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise RedisError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            return self.file.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read() for _ in range(length)]
+        raise RedisError(f'Неожиданный ответ: {line!r}')
+
+    def pipeline(self, commands):
+        """Отправляет команды одним пакетом и читает все ответы.
+
+        Ошибка сервера в ответе на одну из команд поднимается только
+        после чтения остальных ответов, иначе они достались бы
+        следующему вызову на этом соединении.
+        """
+        self.sock.sendall(b''.join(self._pack(*cmd) for cmd in commands))
+        replies, error = [], None
+        for _ in commands:
+            try:
+                replies.append(self._read())
+            except RedisError as reply_error:
+                error = error or reply_error
+                replies.append(None)
+        if error is not None:
+            raise error
+        return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+
+class RedisCache(BaseCache):
+    """Кеш-бэкенд Django, говорящий на протоколе Redis.
+
+    Не требует сторонних библиотек: LOCATION вида
+    ``redis://host:port/db``. Соединение своё у каждого потока.
+    Целые числа хранятся как есть, чтобы ``incr`` был атомарным.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        url = urlparse(server)
+        self._host = url.hostname or 'localhost'
+        self._port = url.port or 6379
+        self._db = int(url.path.lstrip('/') or 0)
+        self._socket_timeout = params.get('OPTIONS', {}).get(
+            'SOCKET_TIMEOUT', 5
+        )
+        self._local = threading.local()
+
+    @property
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = Connection(
+                self._host, self._port, self._db, self._socket_timeout
+            )
+            self._local.client = client
+        return client
+
+    def _pipeline(self, commands):
+        try:
+            return self._client.pipeline(commands)
+        except RedisError:
+            raise
+        except Exception:
+            # Обрыв или сбой на середине ответа: состояние соединения
+            # неизвестно, поэтому оно закрывается.
+            self._disconnect()
+            raise
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(raw):
+        if raw.startswith(PICKLE_MARK):
+            return pickle.loads(raw)
+        return int(raw)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _ttl(self, timeout):
+        """Время жизни в миллисекундах; None — бессрочно."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return int(timeout * 1000)
+
+    def _set_command(self, key, value, timeout, only_new=False):
+        ttl = self._ttl(timeout)
+        if ttl is not None and ttl <= 0:
+            return ['DEL', key]
+        command = ['SET', key, self._encode(value)]
+        if ttl is not None:
+            command += ['PX', ttl]
+        if only_new:
+            command.append('NX')
+        return command
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        command = self._set_command(key, value, timeout, only_new=True)
+        return self._pipeline([command])[0] is not None
+
+    def get(self, key, default=None, version=None):
+        raw = self._pipeline([('GET', self._key(key, version))])[0]
+        return default if raw is None else self._decode(raw)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._pipeline([self._set_command(key, value, timeout)])
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl is None:
+            command = ('PERSIST', key)
+        elif ttl <= 0:
+            command = ('DEL', key)
+        else:
+            command = ('PEXPIRE', key, ttl)
+        return bool(self._pipeline([command])[0])
+
+    def delete(self, key, version=None):
+        self._pipeline([('DEL', self._key(key, version))])
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        backend_keys = [self._key(key, version) for key in keys]
+        values = self._pipeline([['MGET'] + backend_keys])[0]
+        return {
+            key: self._decode(raw)
+            for key, raw in zip(keys, values) if raw is not None
+        }
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        commands = [
+            self._set_command(self._key(key, version), value, timeout)
+            for key, value in data.items()
+        ]
+        if commands:
+            self._pipeline(commands)
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._pipeline([['DEL'] + keys])
+
+    def has_key(self, key, version=None):
+        return bool(self._pipeline([('EXISTS', self._key(key, version))])[0])
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        value = self._pipeline([('EVAL', INCR_SCRIPT, 1, key, delta)])[0]
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def _pattern(self):
+        """Шаблон SCAN для ключей этого алиаса (всех версий)."""
+        prefix = self.key_prefix
+        for char in '\\*?[]':
+            prefix = prefix.replace(char, '\\' + char)
+        return f'{prefix}:*'
+
+    def clear(self):
+        """Удаляет только ключи своего префикса: база Redis общая
+        у всех алиасов, а может быть и у других приложений.
+        """
+        cursor = b'0'
+        while True:
+            cursor, keys = self._pipeline([
+                ('SCAN', cursor, 'MATCH', self._pattern(), 'COUNT',
+                 SCAN_COUNT)
+            ])[0]
+            if keys:
+                self._pipeline([['DEL'] + keys])
+            if cursor == b'0':
+                return
+
+    def close(self, **kwargs):
+        """Соединение переиспользуется между запросами."""
+
+    def _disconnect(self):
+        client = getattr(self._local, 'client', None)
+        if client is not None:
+            client.close()
+            self._local.client = None
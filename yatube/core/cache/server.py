@@ -0,0 +1,176 @@
+"""Локальная замена сервера Redis для тестов и разработки.
+
+Поддерживает подмножество команд, которое использует RedisCache, а
+EVAL — только для его скриптов, повторяя их на Python.
+Данные живут в памяти процесса.
+"""
+import fnmatch
+import socketserver
+import threading
+import time
+
+from .redis import INCR_SCRIPT
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        args = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            name = args[0].decode().upper()
+            with self.server.lock:
+                try:
+                    reply = self.server.dispatch(name, args[1:])
+                except Exception as error:
+                    reply = error
+            self.wfile.write(_encode(reply))
+
+
+def _encode(reply):
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, Exception):
+        return b'-ERR %s\r\n' % str(reply).encode()
+    if isinstance(reply, str):
+        return b'+%s\r\n' % reply.encode()
+    if isinstance(reply, int):
+        return b':%d\r\n' % reply
+    if isinstance(reply, list):
+        return b'*%d\r\n' % len(reply) + b''.join(map(_encode, reply))
+    return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """Сервер RESP в фоновом потоке: ``with StandInRedis() as server``.
+
+    Адрес для LOCATION доступен в ``server.url``.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'redis://{host}:{port}/0'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def _alive(self, key):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _expire(self, key, milliseconds):
+        self.expires[key] = time.monotonic() + int(milliseconds) / 1000
+
+    def dispatch(self, name, args):
+        self.commands.append(name)
+        handler = getattr(self, f'cmd_{name.lower()}', None)
+        if handler is None:
+            raise ValueError(f"unknown command '{name}'")
+        return handler(*args)
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self._expire(key, options[options.index(b'PX') + 1])
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def cmd_exists(self, key):
+        return int(self._alive(key))
+
+    def cmd_incrby(self, key, delta):
+        value = int(self.cmd_get(key) or 0) + int(delta)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self._expire(key, milliseconds)
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self.expires.pop(key, None) is not None)
+
+    def cmd_scan(self, cursor, *options):
+        """SCAN по ключам в порядке сортировки; курсор — последний
+        просмотренный ключ в hex, поэтому удаление между вызовами
+        ничего не пропускает. MATCH — шаблон glob, COUNT — шаг.
+        """
+        options = dict(zip(
+            [option.upper() for option in options[::2]], options[1::2]
+        ))
+        pattern = options.get(b'MATCH', b'*')
+        count = int(options.get(b'COUNT', 10))
+        last = b'' if cursor == b'0' else bytes.fromhex(cursor.decode())
+        keys = sorted(
+            key for key in list(self.data) if key > last and self._alive(key)
+        )
+        batch = keys[:count]
+        return [
+            batch[-1].hex().encode() if len(keys) > count else b'0',
+            [key for key in batch if fnmatch.fnmatchcase(key, pattern)],
+        ]
+
+    def cmd_eval(self, script, numkeys, *args):
+        """Скрипт целиком выполняется под общей блокировкой сервера."""
+        keys, argv = args[:int(numkeys)], args[int(numkeys):]
+        if script.decode() == INCR_SCRIPT:
+            if not self._alive(keys[0]):
+                return None
+            return self.cmd_incrby(keys[0], argv[0])
+        raise ValueError('unknown script')
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
@@ -0,0 +1,164 @@
+import threading
+import time
+from contextlib import ExitStack
+from urllib.parse import urlencode
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from core.bench import report, summarize, write_report
+from core.metrics import Sample
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+def page_targets():
+    """Основные страницы на самых тяжёлых объектах базы:
+    (имя, адрес, пользователь или None).
+    """
+    post = Post.objects.order_by('-comments_count').first()
+    if post is None:
+        raise CommandError('База пуста, наполните её командой seed_bench.')
+    group = Group.objects.order_by('-posts_count').first()
+    author = AuthorStats.objects.order_by('-followers_count').first()
+    reader = AuthorStats.objects.order_by('-following_count').first()
+    word = max(post.text.split(), key=len).strip('.,')
+    index = reverse('posts:index')
+    targets = [
+        ('index', index, None),
+        ('index_deep', f'{index}?page=50', None),
+        ('index_cursor', f'{index}?cursor=', None),
+        ('profile', reverse(
+            'posts:profile', args=(author.user.username,)
+        ), None),
+        ('post_detail', reverse('posts:post_detail', args=(post.pk,)), None),
+        ('comments', reverse('posts:comments', args=(post.pk,)), None),
+        ('follow_index', reverse('posts:follow_index'), reader.user),
+        ('search', f'{reverse("search:search")}?{urlencode({"q": word})}',
+         None),
+    ]
+    if group is not None:
+        targets.append(
+            ('group_list', reverse('posts:group_list', args=(group.slug,)),
+             None)
+        )
+    return targets
+
+
+def _client(user):
+    """У каждого потока свой клиент: у клиента общие cookie."""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def _request(client, url):
+    """(секунды, запросов к базе, ошибка ли) одного запроса."""
+    sample = Sample()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample))
+        try:
+            failed = client.get(url).status_code >= 400
+        except Exception:
+            failed = True
+    return time.perf_counter() - started, sample.queries, failed
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает основные страницы и пишет в JSON запросы в секунду, '
+        'p50/p95/p99 задержки и число запросов к базе. Запросы идут в '
+        'текущую базу, наполните её командой seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Запросов на страницу.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Одновременных клиентов.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Запросов на страницу до замера (прогрев кешей).',
+        )
+        parser.add_argument(
+            '--only', nargs='+', help='Замерить только эти страницы.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        targets = [
+            target for target in page_targets()
+            if not options['only'] or target[0] in options['only']
+        ]
+        results = []
+        for name, url, user in targets:
+            summary = self.measure(url, user, options)
+            results.append({'page': name, 'url': url, **summary})
+            self.stderr.write(
+                f'{name}: {summary["rps"]} rps, p50 {summary["p50_ms"]} мс, '
+                f'p99 {summary["p99_ms"]} мс, '
+                f'запросов к базе {summary["queries_avg"]}'
+            )
+        params = {
+            key: options[key] for key in ('requests', 'concurrency', 'warmup')
+        }
+        params['dataset'] = {
+            'users': User.objects.count(),
+            'groups': Group.objects.count(),
+            'posts': Post.objects.count(),
+            'comments': Comment.objects.count(),
+            'follows': Follow.objects.count(),
+        }
+        write_report(
+            report('pages', params, results), options['output'], self.stdout
+        )
+
+    def measure(self, url, user, options):
+        concurrency = max(options['concurrency'], 1)
+        clients = [_client(user) for _ in range(concurrency)]
+        for _ in range(options['warmup']):
+            _request(clients[0], url)
+        latencies, queries = [], []
+        errors = 0
+        lock = threading.Lock()
+
+        def worker(client, count):
+            nonlocal errors
+            try:
+                for _ in range(count):
+                    elapsed, executed, failed = _request(client, url)
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(executed)
+                        errors += failed
+            finally:
+                connections.close_all()
+
+        shares = [
+            options['requests'] // concurrency
+            + (number < options['requests'] % concurrency)
+            for number in range(concurrency)
+        ]
+        threads = [
+            threading.Thread(target=worker, args=(client, share))
+            for client, share in zip(clients, shares)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = summarize(latencies, time.perf_counter() - started, errors)
+        summary['queries_avg'] = (
+            round(sum(queries) / len(queries), 1) if queries else None
+        )
+        summary['queries_max'] = max(queries, default=None)
+        return summary
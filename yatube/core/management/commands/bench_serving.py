@@ -0,0 +1,166 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from core.asgi import AsgiHandler
+from core.bench import report, summarize, write_report
+
+
+def _scope(path):
+    path, _, query = path.partition('?')
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'query_string': query.encode(),
+        'headers': [(b'host', b'localhost')],
+        'server': ('localhost', 80),
+        'client': ('127.0.0.1', 0),
+    }
+
+
+class WsgiWorkers:
+    """Синхронные воркеры: поток занят, пока клиент не дочитает ответ."""
+
+    def __init__(self, threads, client_delay):
+        self.app = WSGIHandler()
+        self.pool = ThreadPoolExecutor(threads)
+        self.client_delay = client_delay
+
+    def serve(self, path):
+        status = {}
+
+        def start_response(line, headers, exc_info=None):
+            status['code'] = int(line.split(' ', 1)[0])
+
+        environ = AsgiHandler.environ(_scope(path), io.BytesIO())
+        result = self.app(environ, start_response)
+        try:
+            for _ in result:
+                pass
+            time.sleep(self.client_delay)
+        finally:
+            result.close()
+        return status['code']
+
+    async def request(self, path):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, self.serve, path)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+class AsgiClients:
+    """ASGI-вход: медленный клиент читает ответ из цикла событий."""
+
+    def __init__(self, threads, client_delay):
+        self.app = AsgiHandler(threads, threads)
+        self.client_delay = client_delay
+
+    async def request(self, path):
+        status = {}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            elif not message.get('more_body', False):
+                await asyncio.sleep(self.client_delay)
+
+        await self.app(_scope(path), receive, send)
+        return status['code']
+
+    def close(self):
+        self.app.close()
+
+
+async def _load(server, paths, connections, per_connection):
+    latencies = []
+    errors = 0
+
+    async def client(number):
+        nonlocal errors
+        for index in range(per_connection):
+            path = paths[(number + index) % len(paths)]
+            started = time.perf_counter()
+            code = await server.request(path)
+            latencies.append(time.perf_counter() - started)
+            errors += code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(connections)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI вход под нагрузкой медленных клиентов: '
+        'запросы в секунду и хвосты задержек. Запросы идут в текущую '
+        'базу, наполните её командой seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Адрес страницы; можно указать несколько раз.',
+        )
+        parser.add_argument(
+            '--connections', type=int, nargs='+', default=[100, 1000],
+            help='Уровни одновременных соединений.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=3,
+            help='Запросов на одно соединение.',
+        )
+        parser.add_argument(
+            '--threads', type=int, default=settings.ASGI_READ_THREADS,
+            help='Потоков у обоих входов.',
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=0.05,
+            help='Сколько секунд клиент читает ответ.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/']
+        servers = {'wsgi': WsgiWorkers, 'asgi': AsgiClients}
+        results = []
+        for connections in options['connections']:
+            for name, server_class in servers.items():
+                server = server_class(
+                    options['threads'], options['client_delay']
+                )
+                try:
+                    summary = asyncio.run(_load(
+                        server, paths, connections, options['requests']
+                    ))
+                finally:
+                    server.close()
+                results.append(
+                    {'server': name, 'connections': connections, **summary}
+                )
+                self.stderr.write(
+                    f'{name} x{connections}: {summary["rps"]} rps, '
+                    f'p99 {summary["p99_ms"]} мс'
+                )
+        params = {
+            key: options[key]
+            for key in ('requests', 'threads', 'client_delay')
+        }
+        params['paths'] = paths
+        write_report(
+            report('serving', params, results),
+            options['output'],
+            self.stdout,
+        )
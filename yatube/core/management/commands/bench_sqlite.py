@@ -0,0 +1,158 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.bench import report, summarize, write_report
+from core.sqlite import PROFILES, database_settings
+from posts.models import Group, Post, User
+
+BENCH_USERNAME = 'bench_sqlite'
+
+
+def _copy_database(target_path):
+    primary = connections['default']
+    primary.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        primary.connection.backup(target)
+    finally:
+        target.close()
+
+
+def _failed(method, *args):
+    """Запрос завершился ошибкой (например, «database is locked»)."""
+    try:
+        return method(*args).status_code >= 400
+    except Exception:
+        return True
+
+
+def _fixtures():
+    """Автор, группа и пост для замера во временной копии базы."""
+    user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+    group, _ = Group.objects.get_or_create(
+        slug='bench-sqlite',
+        defaults={'title': 'Замер SQLite', 'description': 'Замер'},
+    )
+    post = Post.objects.filter(author=user).first() or Post.objects.create(
+        author=user, group=group, text='Пост для замера SQLite'
+    )
+    return user, group, post
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает профили SQLite под одновременными чтениями лент и '
+        'записью комментариев. Каждый профиль работает со своей копией '
+        'текущей базы, сама база не меняется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', default=list(PROFILES),
+            choices=list(PROFILES), help='Профили для сравнения.',
+        )
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=5,
+            help='Секунд на профиль.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite.')
+        database = settings.DATABASES['default']
+        original = dict(database)
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                _copy_database(path)
+                connections.close_all()
+                database.update(NAME=path, **database_settings(profile))
+                try:
+                    with override_settings(DATABASE_PROFILE=profile):
+                        results.extend(self.measure(profile, options))
+                finally:
+                    connections.close_all()
+                    database.clear()
+                    database.update(original)
+        params = {
+            key: options[key] for key in ('readers', 'writers', 'duration')
+        }
+        write_report(
+            report('sqlite', params, results), options['output'], self.stdout
+        )
+
+    def measure(self, profile, options):
+        user, group, post = _fixtures()
+        connections.close_all()
+        read_urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(group.slug,)),
+            reverse('posts:profile', args=(user.username,)),
+            reverse('posts:post_detail', args=(post.pk,)),
+        ]
+        comment_url = reverse('posts:add_comment', args=(post.pk,))
+        samples = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def worker(kind, number):
+            client = Client(HTTP_HOST='localhost')
+            if kind == 'write':
+                client.force_login(user)
+            index = number
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    if kind == 'read':
+                        failed = _failed(
+                            client.get, read_urls[index % len(read_urls)]
+                        )
+                    else:
+                        failed = _failed(
+                            client.post, comment_url,
+                            {'text': f'Замер {index}'},
+                        )
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        samples[kind].append(elapsed)
+                        errors[kind] += failed
+                    index += 1
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(kind, number))
+            for kind, count in (
+                ('read', options['readers']), ('write', options['writers'])
+            )
+            for number in range(count)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        rows = []
+        for kind in ('read', 'write'):
+            summary = summarize(samples[kind], elapsed, errors[kind])
+            rows.append({'profile': profile, 'kind': kind, **summary})
+            self.stderr.write(
+                f'{profile} {kind}: {summary["rps"]} rps, '
+                f'p99 {summary["p99_ms"]} мс, ошибок {errors[kind]}'
+            )
+        return rows
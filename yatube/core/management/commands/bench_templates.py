@@ -0,0 +1,120 @@
+import copy
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from core.bench import report, summarize, write_report
+from core.templating import template_loaders, warm_up
+
+from .bench_pages import page_targets
+
+# Режим: (кеширующий загрузчик, прогрев до первого запроса).
+MODES = {
+    'plain': (False, False),
+    'cached': (True, False),
+    'warm': (True, True),
+}
+TEMPLATE_TIMING = re.compile(r'tpl;dur=([\d.]+)')
+
+
+def _templates(cached):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    for engine in templates:
+        engine.pop('APP_DIRS', None)
+        engine.setdefault('OPTIONS', {})['loaders'] = template_loaders(
+            cached
+        )
+    return templates
+
+
+def _request(client, url):
+    """(секунды всего запроса, секунды рендеринга шаблонов)."""
+    started = time.perf_counter()
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    elapsed = time.perf_counter() - started
+    timing = TEMPLATE_TIMING.search(response.get('Server-Timing', ''))
+    return elapsed, float(timing.group(1)) / 1000 if timing else 0.0
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендеринга основных страниц без кеша шаблонов, '
+        'с кеширующим загрузчиком и с прогревом при старте. Время шаблонов '
+        'берётся из Server-Timing (core/metrics.py). Запросы идут в '
+        'текущую базу, наполните её командой seed_bench.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов на страницу после первого.',
+        )
+        parser.add_argument(
+            '--modes', nargs='+', default=list(MODES), choices=list(MODES),
+            help='Режимы для сравнения.',
+        )
+        parser.add_argument(
+            '--only', nargs='+', help='Замерить только эти страницы.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        targets = [
+            target for target in page_targets()
+            if not options['only'] or target[0] in options['only']
+        ]
+        clients = {}
+        for name, url, user in targets:
+            clients[name] = Client()
+            if user is not None:
+                clients[name].force_login(user)
+            # Кеши данных прогреваются до замера, чтобы первый запрос
+            # каждого режима отличался только загрузкой шаблонов.
+            _request(clients[name], url)
+        results = []
+        for mode in options['modes']:
+            cached, warm = MODES[mode]
+            with override_settings(
+                TEMPLATES=_templates(cached), METRICS_SAMPLE_RATE=1
+            ):
+                started = time.perf_counter()
+                compiled = warm_up() if warm else 0
+                warmup_ms = round((time.perf_counter() - started) * 1000, 2)
+                for name, url, _ in targets:
+                    row = self.measure(clients[name], url, options)
+                    results.append({
+                        'mode': mode, 'page': name, 'url': url,
+                        'warmup_ms': warmup_ms, 'compiled': compiled, **row,
+                    })
+                    self.stderr.write(
+                        f'{mode} {name}: первый запрос {row["first_ms"]} мс, '
+                        f'p50 {row["p50_ms"]} мс, шаблоны '
+                        f'{row["template_avg_ms"]} мс'
+                    )
+        params = {'requests': options['requests']}
+        write_report(
+            report('templates', params, results), options['output'],
+            self.stdout,
+        )
+
+    def measure(self, client, url, options):
+        first, first_templates = _request(client, url)
+        latencies, templates = [], []
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            elapsed, rendering = _request(client, url)
+            latencies.append(elapsed)
+            templates.append(rendering)
+        summary = summarize(latencies, time.perf_counter() - started)
+        summary['first_ms'] = round(first * 1000, 2)
+        summary['first_template_ms'] = round(first_templates * 1000, 2)
+        summary['template_avg_ms'] = (
+            round(sum(templates) / len(templates) * 1000, 2)
+            if templates else None
+        )
+        return summary
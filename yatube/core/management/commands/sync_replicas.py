@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import freshness
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик. С --interval '
+        'повторяет копирование, изображая отстающую репликацию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд (по умолчанию один раз).',
+        )
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование реплик есть только для SQLite.')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не заданы: YATUBE_DB_REPLICAS.')
+        while True:
+            self.sync(primary)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, primary):
+        primary.ensure_connection()
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+        # Страницы, отданные с отстававшей реплики, получили ETag
+        # новых меток — сбрасываем их, раз реплики догнали основную базу.
+        freshness.touch(freshness.ALL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплики обновлены: {", ".join(settings.DATABASE_REPLICAS)}'
+        ))
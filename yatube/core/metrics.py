@@ -0,0 +1,377 @@
+"""Замеры стоимости представлений.
+
+MetricsMiddleware для доли запросов ``METRICS_SAMPLE_RATE`` считает
+запросы к базе и их время, время рендеринга шаблонов, попадания и
+промахи кеша и общее время ответа. Замер уходит клиенту заголовком
+``Server-Timing`` и копится в гистограммах по имени представления
+(``posts:index``), которые сотрудникам отдаёт ``/metrics/``.
+
+Гистограммы общие для всех воркеров: каждый копит замеры у себя и не
+реже раза в ``METRICS_FLUSH_SECONDS`` прибавляет их через ``incr`` к
+счётчикам корзин в кеше ``METRICS_CACHE``. ``/metrics/`` показывает
+сумму; замеры других воркеров появляются в ней с этой задержкой.
+Время потокового ответа учитывается до начала отдачи тела.
+
+Обёртки рендеринга шаблонов и бэкендов кеша ставятся, только если
+замеры включены, и только на бэкенды из ``CACHES``.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+# Верхние границы корзин; последняя корзина — всё, что больше.
+TIME_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Суммы хранятся в кеше целыми: в тысячных долях (мкс для времени).
+SUM_SCALE = 1000
+
+# Ключ кеша со списком представлений, у которых есть замеры.
+VIEWS_KEY = 'views'
+
+_MISSING = object()
+
+_current = threading.local()
+
+
+def _sample():
+    return getattr(_current, 'sample', None)
+
+
+class Sample:
+    """Замер одного запроса; сам служит обёрткой запросов к базе."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.templates = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Вложенные шаблоны ({% include %}) и get_many, вызывающий get,
+        # не должны учитываться дважды.
+        self.rendering = False
+        self.caching = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.sql * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.templates * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+
+    def quantile(self, share):
+        """Верхняя граница корзины, в которую попадает квантиль."""
+        rank = share * sum(self.counts)
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+    @property
+    def labels(self):
+        return [str(bound) for bound in self.bounds] + ['+Inf']
+
+    def counters(self):
+        """Целые счётчики для incr: корзины и сумма."""
+        return {
+            **dict(zip(self.labels, self.counts)),
+            'sum': round(self.total * SUM_SCALE),
+        }
+
+    def load(self, counters):
+        self.counts = [counters.get(label, 0) for label in self.labels]
+        self.total = counters.get('sum', 0) / SUM_SCALE
+
+    def as_dict(self):
+        return {
+            'buckets': dict(zip(self.labels, self.counts)),
+            'sum': round(self.total, 3),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.histograms = {
+            'latency_ms': Histogram(TIME_BUCKETS_MS),
+            'sql_ms': Histogram(TIME_BUCKETS_MS),
+            'template_ms': Histogram(TIME_BUCKETS_MS),
+            'queries': Histogram(QUERY_BUCKETS),
+        }
+
+    def add(self, sample, total):
+        self.requests += 1
+        self.cache_hits += sample.cache_hits
+        self.cache_misses += sample.cache_misses
+        self.histograms['latency_ms'].add(total * 1000)
+        self.histograms['sql_ms'].add(sample.sql * 1000)
+        self.histograms['template_ms'].add(sample.templates * 1000)
+        self.histograms['queries'].add(sample.queries)
+
+    def counters(self):
+        """Все счётчики представления: ``requests``,
+        ``latency_ms:250``, ``sql_ms:sum`` и т. д.
+        """
+        counters = {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+        for name, histogram in self.histograms.items():
+            for key, value in histogram.counters().items():
+                counters[f'{name}:{key}'] = value
+        return counters
+
+    @classmethod
+    def from_counters(cls, counters):
+        stats = cls()
+        stats.requests = counters.get('requests', 0)
+        stats.cache_hits = counters.get('cache_hits', 0)
+        stats.cache_misses = counters.get('cache_misses', 0)
+        for name, histogram in stats.histograms.items():
+            prefix = f'{name}:'
+            histogram.load({
+                key[len(prefix):]: value
+                for key, value in counters.items() if key.startswith(prefix)
+            })
+        return stats
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            **{
+                name: histogram.as_dict()
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+
+class Registry:
+    """Гистограммы по именам представлений, общие для воркеров.
+
+    ``record`` копит замеры в процессе, ``flush`` переносит их в кеш,
+    ``snapshot`` читает сумму по всем воркерам.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.flushed = time.monotonic()
+
+    @staticmethod
+    def _cache():
+        return caches[settings.METRICS_CACHE]
+
+    def record(self, view, sample, total):
+        with self.lock:
+            if view not in self.views:
+                self.views[view] = ViewStats()
+            self.views[view].add(sample, total)
+            due = (
+                time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Прибавляет накопленное к счётчикам в кеше."""
+        with self.lock:
+            pending, self.views = self.views, {}
+            self.flushed = time.monotonic()
+        if not pending:
+            return
+        cache = self._cache()
+        known = set(cache.get(VIEWS_KEY, ()))
+        if not known.issuperset(pending):
+            cache.set(VIEWS_KEY, sorted(known | set(pending)), None)
+        for view, stats in pending.items():
+            for name, delta in stats.counters().items():
+                if not delta:
+                    continue
+                key = f'{view}:{name}'
+                cache.add(key, 0, None)
+                cache.incr(key, delta)
+
+    def _keys(self, views):
+        names = list(ViewStats().counters())
+        return [f'{view}:{name}' for view in views for name in names]
+
+    def snapshot(self):
+        self.flush()
+        cache = self._cache()
+        views = cache.get(VIEWS_KEY, [])
+        values = cache.get_many(self._keys(views))
+        result = {}
+        for view in views:
+            prefix = f'{view}:'
+            result[view] = ViewStats.from_counters({
+                key[len(prefix):]: value
+                for key, value in values.items() if key.startswith(prefix)
+            }).as_dict()
+        return {
+            'sample_rate': settings.METRICS_SAMPLE_RATE,
+            'flush_seconds': settings.METRICS_FLUSH_SECONDS,
+            'views': result,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+        cache = self._cache()
+        views = cache.get(VIEWS_KEY, [])
+        cache.delete_many(self._keys(views) + [VIEWS_KEY])
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Замеряет выбранные запросы; стоит первой в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.METRICS_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        sample = Sample()
+        _current.sample = sample
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            _current.sample = None
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        registry.record(match.view_name if match else '-', sample, total)
+        response['Server-Timing'] = sample.server_timing(total)
+        return response
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        sample = _sample()
+        if sample is None or sample.rendering:
+            return render(self, context)
+        sample.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            sample.templates += time.perf_counter() - started
+            sample.rendering = False
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        sample = _sample()
+        if sample is None or sample.caching:
+            return get(self, key, default, version)
+        sample.caching = True
+        try:
+            value = get(self, key, _MISSING, version)
+        finally:
+            sample.caching = False
+        if value is _MISSING:
+            sample.cache_misses += 1
+            return default
+        sample.cache_hits += 1
+        return value
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        sample = _sample()
+        if sample is None or sample.caching:
+            return get_many(self, keys, version)
+        keys = list(keys)
+        sample.caching = True
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            sample.caching = False
+        sample.cache_hits += len(found)
+        sample.cache_misses += len(keys) - len(found)
+        return found
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _patch(cls, name, decorator):
+    method = getattr(cls, name)
+    if not getattr(method, 'instrumented', False):
+        setattr(cls, name, decorator(method))
+
+
+def install():
+    """Встраивает замеры в рендеринг шаблонов и в бэкенды кеша из
+    CACHES, если замеры включены.
+
+    Вне выбранного запроса обёртки сразу вызывают исходный метод.
+    """
+    if not settings.METRICS_SAMPLE_RATE:
+        return
+    _patch(Template, 'render', _timed_render)
+    for path in {alias['BACKEND'] for alias in settings.CACHES.values()}:
+        backend = import_string(path)
+        _patch(backend, 'get', _counted_get)
+        _patch(backend, 'get_many', _counted_get_many)
+
+
+@receiver(setting_changed)
+def _settings_changed(setting, **kwargs):
+    """Тесты могут включить замеры или сменить бэкенды кеша."""
+    if setting in ('CACHES', 'METRICS_SAMPLE_RATE'):
+        install()
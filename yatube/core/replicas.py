@@ -0,0 +1,99 @@
+"""Чтение с реплик базы данных.
+
+Запись всегда идёт в ``default``. Чтение уходит на реплику только
+внутри GET-запроса к представлению ``@read_only`` — его помечает
+ReplicaMiddleware. После записи пользователь получает cookie и
+``DATABASE_PIN_SECONDS`` читает с основной базы, чтобы видеть свои
+изменения, даже если реплика отстаёт.
+
+Страница с ETag, изменённая не раньше ``DATABASE_REPLICA_LAG`` секунд
+назад, читается с основной базы (``use_primary`` из posts.freshness):
+иначе клиент сохранил бы тело с реплики под ETag новой версии и
+получал бы на него 304.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+# Кеш в базе, сессии и хранилище ключей sorl читаются только с основной
+# базы: их пишут почти на каждом запросе, и отставание здесь опасно.
+PRIMARY_ONLY_APPS = frozenset(('django_cache', 'sessions', 'thumbnail'))
+
+PIN_COOKIE = 'yatube_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = threading.local()
+
+
+def _primary_only(model):
+    return model._meta.app_label in PRIMARY_ONLY_APPS
+
+
+def use_primary():
+    """Остальные чтения текущего запроса идут в основную базу."""
+    _state.use_replicas = False
+
+
+class ReplicaRouter:
+    """Роутер: реплики для помеченных чтений, основная база для прочего."""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or _primary_only(model):
+            return None
+        if not getattr(_state, 'use_replicas', False):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if not _primary_only(model):
+            _state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    """Включает реплики для чтений и закрепляет писавших за основной
+    базой.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.use_replicas = False
+        if _state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                str(int(time.time()) + settings.DATABASE_PIN_SECONDS),
+                max_age=settings.DATABASE_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _state.use_replicas = (
+            getattr(view_func, 'read_only', False)
+            and request.method in SAFE_METHODS
+            and not self.pinned(request)
+        )
+
+    @staticmethod
+    def pinned(request):
+        try:
+            until = int(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            return False
+        return until > time.time()
@@ -0,0 +1,58 @@
+"""Профили настройки SQLite.
+
+``django`` — поведение Django по умолчанию: журнал отката, новое
+соединение на каждый запрос. ``tuned`` — WAL (читатели не ждут
+писателя), ``synchronous=NORMAL`` (fsync только при контрольной
+точке), отображение файла в память, увеличенный кеш страниц, ожидание
+блокировки вместо мгновенной ошибки и постоянные соединения.
+
+Модуль импортируется из settings.py, поэтому не должен зависеть
+от настроенного Django.
+"""
+PROFILES = {
+    'django': {
+        'CONN_MAX_AGE': 0,
+        'TIMEOUT': 5,
+        'PRAGMAS': {'journal_mode': 'DELETE'},
+    },
+    'tuned': {
+        'CONN_MAX_AGE': 60,
+        'TIMEOUT': 20,
+        'PRAGMAS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # Отрицательное значение — размер в КиБ: 64 МиБ.
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+    },
+}
+
+
+def database_settings(profile):
+    """Часть записи DATABASES для профиля."""
+    if profile not in PROFILES:
+        raise ValueError(f'Неизвестный профиль SQLite: {profile}')
+    options = PROFILES[profile]
+    return {
+        'CONN_MAX_AGE': options['CONN_MAX_AGE'],
+        'OPTIONS': {'timeout': options['TIMEOUT']},
+    }
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Выставляет PRAGMA профиля каждому новому соединению SQLite.
+
+    Реплики дополнительно открываются только для чтения.
+    """
+    from django.conf import settings
+
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = dict(PROFILES[settings.DATABASE_PROFILE]['PRAGMAS'])
+    if connection.alias in settings.DATABASE_REPLICAS:
+        pragmas['query_only'] = 'ON'
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
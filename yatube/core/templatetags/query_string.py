@@ -0,0 +1,19 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def query_string(context, **params):
+    """Текущие GET-параметры с заменёнными значениями.
+
+    Параметр со значением None удаляется: ``?{% query_string page=2 %}``
+    на странице поиска сохраняет ``q``.
+    """
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query.pop(name, None)
+        if value is not None:
+            query[name] = value
+    return query.urlencode()
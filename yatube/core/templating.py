@@ -0,0 +1,67 @@
+"""Загрузчики шаблонов и прогрев скомпилированных шаблонов.
+
+Без кеширующего загрузчика каждый запрос заново читает и разбирает
+``base.html``, карточки постов, пагинатор и остальные включаемые
+шаблоны. С ``TEMPLATE_CACHE`` загрузчики оборачиваются в
+``cached.Loader``: шаблон компилируется один раз на процесс, а
+``warm_up`` при старте компилирует все шаблоны каталога ``templates/``,
+чтобы первый запрос воркера не платил за разбор.
+
+Кешированный шаблон не перечитывается при правке файла, поэтому при
+DEBUG кеш по умолчанию выключен.
+
+Модуль импортируется из settings.py, поэтому не должен зависеть
+от настроенного Django.
+"""
+import logging
+import os
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADER = 'django.template.loaders.cached.Loader'
+
+logger = logging.getLogger(__name__)
+
+
+def template_loaders(cached):
+    """Значение OPTIONS['loaders'] записи TEMPLATES."""
+    if cached:
+        return [(CACHED_LOADER, list(LOADERS))]
+    return list(LOADERS)
+
+
+def template_names(directory):
+    """Имена всех шаблонов каталога в виде для get_template."""
+    for root, _, files in os.walk(directory):
+        for file in sorted(files):
+            if file.endswith(('.html', '.txt')):
+                path = os.path.relpath(os.path.join(root, file), directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_up():
+    """Компилирует шаблоны каталогов DIRS всех движков Django.
+
+    Возвращает число скомпилированных шаблонов; шаблон с ошибкой
+    пропускается и попадает в лог — упадёт он при первом рендеринге.
+    """
+    from django.template import TemplateSyntaxError, engines
+    from django.template.backends.django import DjangoTemplates
+
+    compiled = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        for directory in engine.dirs:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError as error:
+                    logger.warning('Шаблон %s не скомпилирован: %s',
+                                   name, error)
+                else:
+                    compiled += 1
+    return compiled
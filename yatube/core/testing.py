@@ -0,0 +1,84 @@
+"""Бюджеты запросов к базе для тестов.
+
+``query_budget`` — контекстный менеджер и декоратор: если внутри
+выполнено больше запросов, чем разрешено, тест падает с перечнем SQL.
+Запросы одной формы (литералы заменены на ``?``) сгруппированы, и
+повторяющиеся отмечены: так в отчёте сразу видно запрос на каждый
+элемент ленты.
+
+``clear_caches`` очищает все алиасы кеша: у каждого своё хранилище, и
+``cache.clear()`` больше не задевает остальные.
+"""
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_IN_LISTS = re.compile(r'IN \((?:\?, )+\?\)')
+
+
+def clear_caches():
+    """Холодный кеш для теста: очищает все алиасы CACHES."""
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_shape(sql):
+    """SQL без конкретных значений, чтобы сравнивать запросы."""
+    return _IN_LISTS.sub('IN (...)', _LITERALS.sub('?', sql))
+
+
+def budget_report(label, budget, queries):
+    """Текст ошибки: сколько сверх бюджета и какие запросы."""
+    shapes = Counter(query_shape(query['sql']) for query in queries)
+    lines = [
+        f'{label}: {len(queries)} запросов при бюджете {budget} '
+        f'(+{len(queries) - budget}).',
+        'Повторяющиеся запросы (вероятно, запрос на каждый элемент):',
+    ]
+    repeated = [(shape, n) for shape, n in shapes.items() if n > 1]
+    lines.extend(f'+ {n} x {shape}' for shape, n in repeated)
+    if not repeated:
+        lines.append('  нет')
+    lines.append('Все запросы:')
+    lines.extend(
+        f'  {number}. {query["sql"]}'
+        for number, query in enumerate(queries, 1)
+    )
+    return '\n'.join(lines)
+
+
+class query_budget(ContextDecorator):
+    """Не больше ``budget`` запросов к базе ``using``.
+
+    ``captured`` после выхода хранит выполненные запросы.
+    """
+
+    def __init__(self, budget, using='default', label='query budget'):
+        self.budget = budget
+        self.using = using
+        self.label = label
+        self.captured = []
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        self.captured = self.context.captured_queries
+        if exc_type is None and len(self.captured) > self.budget:
+            raise QueryBudgetExceeded(
+                budget_report(self.label, self.budget, self.captured)
+            )
+        return False
@@ -1,7 +1,39 @@
+import asyncio
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
+
+from posts import freshness
+from posts.freshness import conditional_page
+from posts.models import Post
+
+from .apps import create_cache_tables
+from .asgi import AsgiHandler, read_only
+from .cache.config import build_caches
+from .cache.redis import RedisCache, RedisError
+from .cache.server import StandInRedis
+from .metrics import Histogram, Registry, Sample, registry
+from .replicas import PIN_COOKIE, ReplicaMiddleware
+from .sqlite import PROFILES, database_settings
+from .templating import CACHED_LOADER, template_loaders, warm_up
+from .testing import clear_caches
 
 
 User = get_user_model()
@@ -22,3 +54,420 @@ class ErrorPage(TestCase):
 
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class RedisCacheTest(SimpleTestCase):
+    """RedisCache работает с локальной заменой сервера Redis."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = StandInRedis().__enter__()
+        caches_settings = build_caches(
+            cls.server.url, 1, namespaces=('posts',)
+        )
+        cls.cache = RedisCache(
+            cls.server.url, {'KEY_PREFIX': 'posts', 'VERSION': 1}
+        )
+        cls.settings = caches_settings
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cache._disconnect()
+        cls.server.__exit__(None, None, None)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache.clear()
+
+    def test_build_caches(self):
+        """В Redis алиасы различаются только префиксом ключей."""
+        self.assertEqual(
+            self.settings['posts']['BACKEND'], 'core.cache.redis.RedisCache'
+        )
+        self.assertEqual(self.settings['posts']['KEY_PREFIX'], 'posts')
+        self.assertEqual(self.settings['default']['KEY_PREFIX'], 'yatube')
+        self.assertEqual(
+            self.settings['posts']['LOCATION'],
+            self.settings['default']['LOCATION'],
+        )
+
+    def test_build_caches_tables(self):
+        """У DatabaseCache каждое пространство в своей таблице и со
+        своим пределом записей.
+        """
+        caches_settings = build_caches(
+            'db://yatube_cache', 1, namespaces=('posts', 'users')
+        )
+        self.assertEqual(
+            caches_settings['default']['LOCATION'], 'yatube_cache'
+        )
+        self.assertEqual(
+            caches_settings['posts']['LOCATION'], 'yatube_cache_posts'
+        )
+        for alias in ('default', 'posts', 'users'):
+            options = caches_settings[alias]['OPTIONS']
+            self.assertGreater(options['MAX_ENTRIES'], 300)
+            self.assertIn('CULL_FREQUENCY', options)
+
+    def test_clear_keeps_other_prefixes(self):
+        """clear удаляет ключи своего префикса через SCAN и DEL, не
+        трогая чужие ключи в той же базе.
+        """
+        other = RedisCache(
+            self.server.url, {'KEY_PREFIX': 'users', 'VERSION': 1}
+        )
+        self.addCleanup(other._disconnect)
+        self.addCleanup(other.delete, 'key')
+        other.set('key', 'чужое')
+        self.cache.set_many({f'key{number}': number for number in range(7)})
+        self.server.commands.clear()
+        with mock.patch('core.cache.redis.SCAN_COUNT', 3):
+            self.cache.clear()
+        self.assertNotIn('FLUSHDB', self.server.commands)
+        self.assertGreater(self.server.commands.count('SCAN'), 1)
+        self.assertEqual(self.cache.get_many(
+            [f'key{number}' for number in range(7)]
+        ), {})
+        self.assertEqual(other.get('key'), 'чужое')
+
+    def test_get_set_many(self):
+        """Значения переживают сериализацию, get_many — один MGET."""
+        self.cache.set_many({'a': {'x': 1}, 'b': 'текст', 'c': 3})
+        self.server.commands.clear()
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c', 'd']),
+            {'a': {'x': 1}, 'b': 'текст', 'c': 3}
+        )
+        self.assertEqual(self.server.commands, ['MGET'])
+        self.cache.delete_many(['a', 'b'])
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.incr('c', 2), 5)
+
+    def test_error_reply_keeps_connection_in_sync(self):
+        """Ошибка на середине пакета не сдвигает ответы следующим
+        запросам на том же соединении.
+        """
+        self.cache.set('key', 'value')
+        key = self.cache.make_key('key')
+        with self.assertRaises(RedisError):
+            self.cache._pipeline([('GET', key), ('BOGUS',), ('GET', key)])
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+
+    def test_incr_is_single_step(self):
+        """incr — один скрипт: сохраняет TTL и не создаёт ключ."""
+        self.cache.set('counter', 1, timeout=60)
+        self.server.commands.clear()
+        self.assertEqual(self.cache.incr('counter', 4), 5)
+        self.assertEqual(self.server.commands, ['EVAL'])
+        self.assertIn(
+            self.cache.make_key('counter').encode(), self.server.expires
+        )
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.assertFalse(self.cache.has_key('missing'))
+
+    def test_add_and_timeout(self):
+        """add не перезаписывает ключ, нулевой таймаут удаляет его."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('key', 1, timeout=0)
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_version_namespaces(self):
+        """Другие версия и префикс не видят чужих ключей."""
+        self.cache.set('key', 'value')
+        other_version = RedisCache(
+            self.server.url, {'KEY_PREFIX': 'posts', 'VERSION': 2}
+        )
+        other_prefix = RedisCache(
+            self.server.url, {'KEY_PREFIX': 'users', 'VERSION': 1}
+        )
+        self.assertIsNone(other_version.get('key'))
+        self.assertIsNone(other_prefix.get('key'))
+        other_version._disconnect()
+        other_prefix._disconnect()
+
+
+class AsgiHandlerTest(TransactionTestCase):
+    """ASGI-вход отдаёт те же страницы, что и WSGI."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username='asgi_author')
+        Post.objects.create(author=self.user, text='Пост через ASGI')
+        self.handler = AsgiHandler(threads=2, read_threads=2)
+        self.addCleanup(self.handler.close)
+
+    def request(self, path, query=b''):
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query,
+            'headers': [(b'host', b'localhost')],
+        }
+        asyncio.run(self.handler(scope, receive, send))
+        body = b''.join(
+            message.get('body', b'') for message in messages[1:]
+        )
+        return messages[0]['status'], body.decode()
+
+    def test_pages(self):
+        """Страницы и 404 проходят через пул потоков."""
+        status, body = self.request('/profile/asgi_author/')
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertIn('Пост через ASGI', body)
+        status, body = self.request('/search/', 'q=asgi'.encode())
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertIn('Пост через ASGI', body)
+        status, _ = self.request('/NotKnownPage/')
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+
+    @override_settings(STREAMING_FEEDS=True)
+    def test_streaming_in_request_thread(self):
+        """Потоковый ответ выполняется и закрывается в потоке запроса."""
+        threads = []
+
+        def remember(**kwargs):
+            threads.append(threading.get_ident())
+
+        for signal in (request_started, request_finished):
+            signal.connect(remember)
+            self.addCleanup(signal.disconnect, remember)
+        status, body = self.request('/profile/asgi_author/')
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertIn('Пост через ASGI', body)
+        self.assertEqual(len(threads), 2)
+        self.assertEqual(threads[0], threads[1])
+
+    def test_read_only_pool(self):
+        """Представления лент идут в отдельный пул."""
+        self.assertEqual(self.handler.pool_name('/'), 'read')
+        self.assertEqual(self.handler.pool_name('/follow/'), 'read')
+        self.assertEqual(self.handler.pool_name('/create/'), 'default')
+        self.assertEqual(self.handler.pool_name('/missing/'), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRoutingTest(TestCase):
+    """Чтения лент идут на реплики, запись закрепляет за основной."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='replica_user')
+
+    def run_view(self, view, method='get', cookies=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaMiddleware(lambda request: view(request))
+        middleware.process_view(request, view, (), {})
+        return middleware(request)
+
+    def test_routing(self):
+        """Помеченное чтение — реплика, прочее — основная база."""
+        def reading(request):
+            return HttpResponse(Post.objects.all().db)
+
+        self.assertEqual(self.run_view(reading).content, b'default')
+        self.assertIn(
+            self.run_view(read_only(reading)).content,
+            (b'replica1', b'replica2'),
+        )
+        self.assertEqual(
+            self.run_view(read_only(reading), 'post').content, b'default'
+        )
+        self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_read_your_writes(self):
+        """После записи пользователь читает с основной базы."""
+        def writing(request):
+            Post.objects.create(author=self.user, text='Пост')
+            return HttpResponse()
+
+        @read_only
+        def reading(request):
+            return HttpResponse(Post.objects.all().db)
+
+        response = self.run_view(writing)
+        cookie = response.cookies[PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.DATABASE_PIN_SECONDS)
+        pinned = self.run_view(reading, cookies={PIN_COOKIE: cookie.value})
+        self.assertEqual(pinned.content, b'default')
+        self.assertNotIn(PIN_COOKIE, pinned.cookies)
+
+    def test_fresh_conditional_page(self):
+        """Страница с ETag, изменённая позже допустимого отставания
+        реплик, читается с основной базы.
+        """
+        @read_only
+        @conditional_page(lambda: ['replica_page'])
+        def page(request):
+            return HttpResponse(Post.objects.all().db)
+
+        def run():
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            middleware = ReplicaMiddleware(page)
+            middleware.process_view(request, page, (), {})
+            return middleware(request).content
+
+        freshness.touch('replica_page')
+        self.assertEqual(run(), b'default')
+        old = time.time() - settings.DATABASE_REPLICA_LAG - 1
+        caches['posts'].set_many({
+            freshness.PREFIX + key: old
+            for key in ('replica_page', freshness.ALL)
+        }, None)
+        self.assertIn(run(), (b'replica1', b'replica2'))
+
+
+class CacheTablesTest(TestCase):
+    """Таблицы кеша создаются после migrate по текущим CACHES."""
+
+    def test_created_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TABLE yatube_cache_users')
+        create_cache_tables(using='default')
+        self.assertIn(
+            'yatube_cache_users', connection.introspection.table_names()
+        )
+
+
+class SqliteProfileTest(TestCase):
+    """Соединения SQLite получают PRAGMA профиля."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_tuned_profile(self):
+        pragmas = PROFILES['tuned']['PRAGMAS']
+        self.assertEqual(settings.DATABASE_PROFILE, 'tuned')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        self.assertEqual(
+            database_settings('tuned'),
+            {'CONN_MAX_AGE': 60, 'OPTIONS': {'timeout': 20}},
+        )
+        with self.assertRaises(ValueError):
+            database_settings('unknown')
+
+
+class TemplateCacheTest(SimpleTestCase):
+    """Кеширующий загрузчик и прогрев шаблонов при старте."""
+
+    def cached_templates(self):
+        templates = [dict(engine) for engine in settings.TEMPLATES]
+        templates[0]['OPTIONS'] = dict(
+            templates[0]['OPTIONS'], loaders=template_loaders(True)
+        )
+        return templates
+
+    def test_loaders(self):
+        self.assertNotIn(CACHED_LOADER, str(template_loaders(False)))
+        self.assertEqual(template_loaders(True)[0][0], CACHED_LOADER)
+
+    def test_warm_up(self):
+        """Все шаблоны templates/ компилируются до первого запроса."""
+        with override_settings(TEMPLATES=self.cached_templates()):
+            self.assertGreater(warm_up(), 20)
+            loader = engines['django'].engine.template_loaders[0]
+            for name in ('base.html', 'posts/includes/cart_posts.html',
+                         'posts/includes/paginator.html'):
+                self.assertIn(name, loader.get_template_cache)
+            compiled = loader.get_template_cache['base.html']
+            self.assertIs(
+                engines['django'].engine.get_template('base.html'), compiled
+            )
+
+
+@override_settings(
+    METRICS_SAMPLE_RATE=1,
+    CACHES=build_caches(
+        'locmem://metrics', 1, namespaces=('posts', 'metrics')
+    ),
+)
+class MetricsTest(TestCase):
+    """Замеры представлений: Server-Timing и гистограммы."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(
+            username='metrics_staff', is_staff=True
+        )
+        cls.author = User.objects.create_user(username='metrics_author')
+        Post.objects.create(author=cls.author, text='Пост для замеров')
+
+    def setUp(self):
+        registry.reset()
+        clear_caches()
+
+    def test_server_timing(self):
+        """Ответ несёт запросы к базе, шаблоны и кеш."""
+        response = self.client.get('/')
+        timing = response['Server-Timing']
+        for metric in ('db;dur=', 'tpl;dur=', 'cache;desc=', 'total;dur='):
+            self.assertIn(metric, timing)
+        stats = registry.snapshot()['views']['posts:index']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries']['sum'], 0)
+        self.assertGreater(stats['cache_misses'], 0)
+        self.assertGreater(stats['template_ms']['sum'], 0)
+
+    def test_sampling(self):
+        """При нулевой доле запрос не замеряется."""
+        with self.settings(METRICS_SAMPLE_RATE=0):
+            response = self.client.get('/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(registry.snapshot()['views'], {})
+
+    def test_endpoint_for_staff_only(self):
+        """Гистограммы видят только сотрудники."""
+        self.client.get(f'/profile/{self.author.username}/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.staff)
+        views = self.client.get('/metrics/').json()['views']
+        self.assertEqual(views['posts:profile']['requests'], 1)
+
+    def test_workers_share_histograms(self):
+        """Замеры двух воркеров складываются в общем кеше."""
+        sample = Sample()
+        sample.queries = 3
+        workers = [Registry(), Registry()]
+        for worker in workers:
+            worker.record('posts:index', sample, 0.004)
+        workers[0].flush()
+        stats = workers[1].snapshot()['views']['posts:index']
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['queries']['buckets']['5'], 2)
+        self.assertEqual(stats['latency_ms']['sum'], 8)
+
+    def test_only_configured_backends(self):
+        """Обёртки стоят только на бэкендах из CACHES, базовые классы
+        не тронуты.
+        """
+        self.assertTrue(getattr(LocMemCache.get, 'instrumented', False))
+        self.assertFalse(getattr(FileBasedCache.get, 'instrumented', False))
+        self.assertFalse(getattr(BaseCache.get_many, 'instrumented', False))
+
+    def test_histogram(self):
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50, 500):
+            histogram.add(value)
+        self.assertEqual(
+            histogram.as_dict()['buckets'],
+            {'1': 1, '10': 2, '100': 1, '+Inf': 1},
+        )
+        self.assertEqual(histogram.quantile(0.5), 10)
+        self.assertIsNone(histogram.quantile(1))
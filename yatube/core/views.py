@@ -1,7 +1,11 @@
 from http import HTTPStatus
 
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from .metrics import registry
+
 
 # Ошибка 404 -------------------------------------------------------
 def page_not_found(request, exception):
@@ -32,3 +36,12 @@ def csrf_failure(request, exception):
         'core/403.html',
         status=HTTPStatus.FORBIDDEN
     )
+
+
+# Замеры ------------------------------------------------------------
+@staff_member_required
+def metrics(request):
+    """Гистограммы стоимости представлений, сумма по всем воркерам."""
+    return JsonResponse(
+        registry.snapshot(), json_dumps_params={'indent': 2}
+    )
@@ -1,12 +1,15 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from search.admin import IndexedSearchMixin
+
+from .models import AuthorStats, Comment, Follow, Group, Post, Timeline
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Админка размещенных постов."""
 
+    search_kind = 'post'
     list_display = (
         'pk',
         'text',
@@ -34,9 +37,10 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Админка размещенных комментариев."""
 
+    search_kind = 'comment'
     list_display = (
         'pk',
         'text',
@@ -55,3 +59,28 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
+
+
+@admin.register(Timeline)
+class TimelineAdmin(admin.ModelAdmin):
+    """Админка материализованных лент подписок."""
+
+    list_display = (
+        'user',
+        'post',
+        'pub_date',
+    )
+    raw_id_fields = ('user', 'post')
+
+
+@admin.register(AuthorStats)
+class AuthorStatsAdmin(admin.ModelAdmin):
+    """Админка счётчиков авторов."""
+
+    list_display = (
+        'user',
+        'posts_count',
+        'followers_count',
+        'following_count',
+    )
+    readonly_fields = list_display
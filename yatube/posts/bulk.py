@@ -0,0 +1,101 @@
+"""Помощники массовой вставки через bulk_create.
+
+Используются генератором данных для замеров и импортом: строки
+вставляются пачками, сигналы не срабатывают, поэтому производные
+данные (счётчики, ленты, поиск) вызывающий пересчитывает сам.
+
+bulk_create записывает в поля auto_now и auto_now_add текущее время,
+поэтому даты из данных запоминаются до вставки и возвращаются строкам
+запросом update (``restore_dates``). Флаги полей модели не меняются:
+они общие для всего процесса, и параллельные запросы не должны
+сохранять посты без даты.
+"""
+from itertools import islice
+
+from django.db.models import Case, F, Value, When
+
+from .models import render_text
+
+BATCH_SIZE = 2000
+
+# Строк в одном UPDATE с CASE: по два параметра на строку и поле.
+DATES_BATCH = 100
+
+
+def chunked(iterable, size):
+    """Списки по ``size`` элементов, не собирая всё в память."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def date_fields(model):
+    """Поля, которые bulk_create заполняет текущим временем."""
+    return [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+
+
+def saved_dates(model, objects):
+    """Даты объектов из данных; читать до вставки."""
+    fields = date_fields(model)
+    return [
+        {field: getattr(obj, field.attname) for field in fields}
+        for obj in objects
+    ] if fields else []
+
+
+def restore_dates(model, pks, dates):
+    """Возвращает строкам ``pks`` даты ``dates`` из ``saved_dates``:
+    один UPDATE с CASE по pk на DATES_BATCH строк. Строки без даты в
+    данных оставляют время вставки.
+    """
+    for batch in chunked(zip(pks, dates), DATES_BATCH):
+        model.objects.filter(pk__in=[pk for pk, _ in batch]).update(**{
+            field.attname: Case(
+                *(
+                    When(pk=pk, then=Value(row[field], output_field=field))
+                    for pk, row in batch if row[field] is not None
+                ),
+                default=F(field.attname),
+                output_field=field,
+            )
+            for field in batch[0][1]
+        })
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def insert(model, objects, batch_size):
+    """Вставляет объекты пачками; возвращает pk новых строк по порядку.
+
+    SQLite не возвращает pk из bulk_create, поэтому они читаются после
+    вставки: автоинкремент выдаёт их по возрастанию. Даты объектов
+    сохраняются как есть.
+    """
+    last = last_pk(model)
+    dates = []
+    for batch in chunked(objects, batch_size):
+        dates.extend(saved_dates(model, batch))
+        model.objects.bulk_create(batch)
+    pks = list(
+        model.objects.filter(pk__gt=last).order_by('pk').values_list(
+            'pk', flat=True
+        )
+    )
+    restore_dates(model, pks, dates)
+    return pks
+
+
+def rendered(obj):
+    """bulk_create не вызывает save(): HTML текста считается здесь."""
+    obj.text_html = render_text(obj.text)
+    return obj
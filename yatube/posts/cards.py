@@ -0,0 +1,59 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from .thumbnails import attach_thumbnails
+
+CARD_TEMPLATE = 'posts/includes/cart_posts.html'
+VARIANTS = ('feed', 'group', 'profile')
+
+
+def card_key(post, variant, updated=None):
+    """Ключ карточки: id поста и его версия (поле ``updated``)."""
+    updated = updated or post.updated
+    return f'card:{variant}:{post.pk}:{updated.timestamp()}'
+
+
+def card_variant(author=None, group=None):
+    """Вариант карточки и его контекст по странице.
+
+    В профиле не нужна ссылка на автора, в группе — ссылка на группу.
+    """
+    if author:
+        return 'profile', {'author': author}
+    if group:
+        return 'group', {'group': group}
+    return 'feed', {}
+
+
+def render_cards(posts, variant, context=None):
+    """Возвращает HTML карточек постов, беря готовые из кеша.
+
+    Все карточки страницы читаются одним ``get_many``, недостающие
+    рендерятся и сохраняются одним ``set_many``. Миниатюры для них
+    проставляются заранее одним пакетным запросом.
+    """
+    cache = caches['posts']
+    posts = list(posts)
+    keys = [card_key(post, variant) for post in posts]
+    cached = cache.get_many(keys)
+    missing = {}
+    stale = [
+        (key, post) for key, post in zip(keys, posts) if key not in cached
+    ]
+    attach_thumbnails([post for _, post in stale])
+    for key, post in stale:
+        card_context = dict(context or {}, post=post)
+        missing[key] = render_to_string(CARD_TEMPLATE, card_context)
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cached.update(missing)
+    return [cached[key] for key in keys]
+
+
+def forget_cards(post, updated):
+    """Удаляет из кеша все варианты карточки указанной версии."""
+    if updated is not None:
+        caches['posts'].delete_many(
+            [card_key(post, variant, updated) for variant in VARIANTS]
+        )
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from .models import Comment
+from .utils import KeysetPaginator
+
+PAGE_TEMPLATE = 'posts/includes/comments_page.html'
+
+
+def comments_page(post_id, cursor=''):
+    """Страница комментариев поста по ключу (pub_date, id), старые
+    первыми.
+    """
+    ordering = ('pub_date', 'pk')
+    paginator = KeysetPaginator(
+        Comment.objects.select_related('author').filter(
+            post_id=post_id
+        ).order_by(*ordering),
+        settings.COMMENTS_PER_PAGE,
+        ordering=ordering,
+    )
+    return paginator.get_page(cursor)
+
+
+def render_page(post_id, page):
+    return render_to_string(
+        PAGE_TEMPLATE, {'post_id': post_id, 'comments': page}
+    )
+
+
+def first_page_key(post):
+    """Ключ первой страницы меняется с числом комментариев и датой
+    последнего: удаление меняет первое, добавление — оба.
+    """
+    latest = Comment.objects.filter(post=post).order_by(
+        '-pub_date'
+    ).values_list('pub_date', flat=True).first()
+    stamp = latest.timestamp() if latest else 0
+    return f'comments:{post.pk}:{post.comments_count}:{stamp}'
+
+
+def first_page_html(post):
+    """HTML первой страницы комментариев, кешируется отдельно от поста."""
+    cache = caches['posts']
+    key = first_page_key(post)
+    html = cache.get(key)
+    if html is None:
+        html = render_page(post.pk, comments_page(post.pk))
+        cache.set(key, html, settings.COMMENTS_CACHE_TIMEOUT)
+    return html
@@ -0,0 +1,113 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 500
+
+
+def _shift(queryset, field, delta):
+    """Сдвигает счётчик через F(), не опускаясь ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_author(user_id, field, delta):
+    """Меняет счётчик автора.
+
+    Отсутствующая строка создаётся подсчётом только при увеличении:
+    уменьшение приходит из сигналов удаления, в том числе при каскадном
+    удалении самого пользователя, и строку не воскрешает.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if not _shift(stats, field, delta) and delta > 0 and not stats.exists():
+        reconcile_user(user_id)
+
+
+def shift_group(group_id, delta):
+    if group_id is not None:
+        _shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def shift_post(post_id, delta):
+    _shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def _count(model, field, ref='pk'):
+    """Подзапрос: количество строк model, ссылающихся на ref."""
+    rows = model.objects.filter(
+        **{field: OuterRef(ref)}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def _author_counts(ref):
+    return {
+        'actual_posts': _count(Post, 'author', ref),
+        'actual_followers': _count(Follow, 'author', ref),
+        'actual_following': _count(Follow, 'user', ref),
+    }
+
+
+AUTHOR_FIELDS = (
+    ('posts_count', 'actual_posts'),
+    ('followers_count', 'actual_followers'),
+    ('following_count', 'actual_following'),
+)
+
+
+def reconcile_user(user_id):
+    """Пересчитывает счётчики одного пользователя."""
+    user = User.objects.annotate(**_author_counts('pk')).get(pk=user_id)
+    AuthorStats.objects.update_or_create(
+        user=user,
+        defaults={
+            field: getattr(user, actual) for field, actual in AUTHOR_FIELDS
+        }
+    )
+
+
+def _fix(queryset, pairs):
+    """Исправляет расхождения, возвращает число исправленных строк."""
+    fixed = []
+    for obj in queryset.iterator():
+        changed = False
+        for field, actual in pairs:
+            if getattr(obj, field) != getattr(obj, actual):
+                setattr(obj, field, getattr(obj, actual))
+                changed = True
+        if changed:
+            fixed.append(obj)
+    if fixed:
+        queryset.model.objects.bulk_update(
+            fixed, [field for field, _ in pairs], batch_size=BATCH_SIZE
+        )
+    return len(fixed)
+
+
+def reconcile_counters():
+    """Сверяет все счётчики с фактическими данными.
+
+    Возвращает словарь с количеством исправленных строк по моделям.
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk) for pk in missing], batch_size=BATCH_SIZE
+    )
+    return {
+        'stats': _fix(
+            AuthorStats.objects.annotate(**_author_counts('user')),
+            AUTHOR_FIELDS
+        ),
+        'groups': _fix(
+            Group.objects.annotate(actual=_count(Post, 'group')),
+            (('posts_count', 'actual'),)
+        ),
+        'posts': _fix(
+            Post.objects.annotate(actual=_count(Comment, 'post')),
+            (('comments_count', 'actual'),)
+        ),
+    }
@@ -0,0 +1,32 @@
+"""Объекты, которые удаляются в текущем потоке.
+
+Комментарии удаляются вместе с постом каскадом, и post_delete приходит
+по каждому из них. Пока пост удаляется, обработчики комментариев не
+трогают его строку, метку и поисковый индекс: обработчики поста делают
+это один раз за весь пост. Так же поиск обходится с постами и
+комментариями удаляемого пользователя.
+
+Объект отмечается в pre_delete и снимается в post_delete.
+"""
+import threading
+
+_local = threading.local()
+
+
+def _objects():
+    if not hasattr(_local, 'objects'):
+        _local.objects = set()
+    return _local.objects
+
+
+def begin(instance):
+    _objects().add((type(instance), instance.pk))
+
+
+def end(instance):
+    _objects().discard((type(instance), instance.pk))
+
+
+def in_progress(model, pk):
+    """Удаляется ли объект прямо сейчас (каскадом или сам по себе)."""
+    return (model, pk) in _objects()
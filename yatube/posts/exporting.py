@@ -0,0 +1,102 @@
+"""Потоковая выгрузка постов автора или группы.
+
+Посты идут по возрастанию id через iterator(), комментарии каждой
+пачки постов выбираются одним запросом, поэтому память не зависит от
+числа постов. Выгрузку можно продолжить с места обрыва: курсор
+``after`` — id последнего полученного поста.
+
+JSONL — пост на строку с вложенными комментариями. CSV — плоские
+строки поста и его комментариев, колонка ``type`` различает их. Поля
+постов совпадают с форматом импорта (posts.importing), ``image`` —
+путь к файлу в MEDIA_ROOT.
+"""
+import csv
+import io
+import json
+from collections import defaultdict
+
+from .bulk import chunked
+from .models import Comment
+
+CHUNK_SIZE = 500
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_FIELDS = (
+    'type', 'id', 'post', 'author', 'group', 'text', 'pub_date', 'image'
+)
+POST_FIELDS = ('pk', 'author__username', 'group__slug', 'text', 'pub_date',
+               'image')
+COMMENT_FIELDS = ('pk', 'post_id', 'author__username', 'text', 'pub_date')
+
+
+def _comments(post_ids):
+    """Комментарии пачки постов одним запросом, по id поста."""
+    found = defaultdict(list)
+    rows = Comment.objects.filter(post_id__in=post_ids).order_by(
+        'post_id', 'pub_date', 'pk'
+    ).values_list(*COMMENT_FIELDS)
+    for pk, post_id, author, text, pub_date in rows:
+        found[post_id].append({
+            'id': pk,
+            'author': author,
+            'text': text,
+            'pub_date': pub_date.isoformat(),
+        })
+    return found
+
+
+def export_records(posts, after=None, chunk_size=CHUNK_SIZE):
+    """Посты queryset с комментариями, словари по возрастанию id."""
+    if after is not None:
+        posts = posts.filter(pk__gt=after)
+    rows = posts.order_by('pk').values_list(*POST_FIELDS).iterator(
+        chunk_size=chunk_size
+    )
+    for chunk in chunked(rows, chunk_size):
+        comments = _comments([row[0] for row in chunk])
+        for pk, author, group, text, pub_date, image in chunk:
+            yield {
+                'id': pk,
+                'author': author,
+                'group': group,
+                'text': text,
+                'pub_date': pub_date.isoformat(),
+                'image': image or None,
+                'comments': comments[pk],
+            }
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_lines(records, header=True):
+    """Пост со всеми комментариями — один кусок текста."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_FIELDS, extrasaction='ignore')
+
+    def flush():
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    if header:
+        writer.writeheader()
+        yield flush()
+    for record in records:
+        writer.writerow(dict(record, type='post'))
+        for comment in record['comments']:
+            writer.writerow(dict(comment, type='comment', post=record['id']))
+        yield flush()
+
+
+def export_lines(records, export_format='jsonl', header=True):
+    """Текст выгрузки кусками; ``header`` — заголовок CSV."""
+    if export_format == 'csv':
+        return csv_lines(records, header)
+    return jsonl_lines(records)
@@ -0,0 +1,189 @@
+"""Условные GET-запросы (ETag и Last-Modified) для лент и постов.
+
+Для каждой ленты в кеше ``posts`` хранится метка времени последнего
+изменения; сигналы обновляют её при записи постов, комментариев и
+подписок. Представление сначала сверяет метки с заголовками запроса и
+при совпадении отвечает 304, не выполняя выборку и не рендеря шаблон.
+
+Ключи меток: ``index``, ``group:<slug>``, ``author:<username>``,
+``post:<id>`` и ``all`` — общая метка для правок, которые видны на всех
+страницах (имя автора, название группы).
+
+Отдельные метки ``count:<лента>`` меняются, только когда в ленте
+появляется или пропадает пост, — по ним ``version`` решает, устарело ли
+закешированное число постов; правка поста его не сбрасывает. Кроме
+лент с метками страниц есть ``count:follow:<id пользователя>`` — лента
+подписок — и ``count:all`` для массовой загрузки.
+
+Главная условных ответов не даёт: её тело кешируется фрагментом и
+может отставать от метки ``index``.
+
+Пока метки страницы моложе ``DATABASE_REPLICA_LAG``, она читается с
+основной базы: ETag считается по свежим меткам, и тело с отставшей
+реплики закрепилось бы у клиента.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.views.decorators.http import condition
+
+from core import replicas
+
+from .models import Group, Post
+
+PREFIX = 'fresh:'
+ALL = 'all'
+
+
+def touch(*keys):
+    """Отмечает ленты изменёнными."""
+    now = time.time()
+    caches['posts'].set_many(
+        {PREFIX + key: now for key in keys if key}, None
+    )
+
+
+def post_keys(post_id, username, group_slug=None):
+    """Метки страниц, на которых виден пост."""
+    return [
+        'index',
+        f'post:{post_id}',
+        f'author:{username}',
+        f'group:{group_slug}' if group_slug else None,
+    ]
+
+
+def touch_post(post, *old_group_ids):
+    """Отмечает страницы поста, в том числе прежних групп."""
+    group_ids = {post.group_id, *old_group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True
+    ) if group_ids else []
+    touch(
+        *post_keys(post.pk, post.author.username),
+        *(f'group:{slug}' for slug in slugs),
+    )
+
+
+def touch_posts(queryset):
+    """Отмечает изменёнными страницы всех постов queryset."""
+    keys = []
+    for row in queryset.values_list('pk', 'author__username', 'group__slug'):
+        keys.extend(post_keys(*row))
+    touch(*keys)
+
+
+def count_key(feed):
+    return f'count:{feed}'
+
+
+def touch_counts(*feeds):
+    """Отмечает, что в лентах добавился или пропал пост."""
+    touch(*(count_key(feed) for feed in feeds))
+
+
+def touch_all():
+    """Массовая загрузка меняет и страницы, и число постов всех лент."""
+    touch(ALL, count_key(ALL))
+
+
+def follow_feed_key(user_id):
+    return f'follow:{user_id}'
+
+
+def follow_feed_keys(user_ids):
+    return [follow_feed_key(user_id) for user_id in user_ids]
+
+
+def touch_follow(follow):
+    """Подписка меняет счётчики и кнопку в профилях обоих и ленту
+    подписок подписчика.
+    """
+    touch(
+        *author_keys(follow.user.username),
+        *author_keys(follow.author.username),
+        count_key(follow_feed_key(follow.user_id)),
+    )
+
+
+def group_keys(slug):
+    return [f'group:{slug}']
+
+
+def author_keys(username):
+    return [f'author:{username}']
+
+
+def post_page_keys(post_id):
+    """Пост зависит и от автора: на странице его число постов."""
+    username = Post.objects.filter(pk=post_id).values_list(
+        'author__username', flat=True
+    ).first()
+    if username is None:
+        return None
+    return [f'post:{post_id}', f'author:{username}']
+
+
+def stamps(keys):
+    """Метки лент; отсутствующие в кеше заводятся текущим временем."""
+    cache = caches['posts']
+    found = cache.get_many([PREFIX + key for key in keys])
+    now = time.time()
+    missing = {
+        PREFIX + key: now for key in keys if PREFIX + key not in found
+    }
+    for key, value in missing.items():
+        if not cache.add(key, value, None):
+            value = cache.get(key, now)
+        found[key] = value
+    return [found[PREFIX + key] for key in keys]
+
+
+def version(feed):
+    """Версия числа постов ленты: меняется, только когда пост в ленте
+    создан или удалён.
+    """
+    values = stamps([count_key(ALL), count_key(feed)])
+    return ':'.join(repr(value) for value in values)
+
+
+def _state(request, keys_func, kwargs):
+    """(ETag, Last-Modified) запроса; считается один раз на запрос."""
+    if not hasattr(request, '_freshness'):
+        keys = keys_func(**kwargs)
+        if keys is None:
+            request._freshness = (None, None)
+            return request._freshness
+        values = stamps([ALL] + keys)
+        if time.time() - max(values) < settings.DATABASE_REPLICA_LAG:
+            replicas.use_primary()
+        user = request.user
+        viewer = f'u{user.pk}' if user.is_authenticated else 'anon'
+        raw = ':'.join([viewer] + [repr(value) for value in values])
+        etag = hashlib.md5(raw.encode()).hexdigest()
+        # Страница вошедшего пользователя зависит от него самого
+        # (шапка, кнопка подписки), поэтому ей хватает только ETag.
+        modified = None if user.is_authenticated else datetime.fromtimestamp(
+            max(values), timezone.utc
+        )
+        request._freshness = (etag, modified)
+    return request._freshness
+
+
+def conditional_page(keys_func):
+    """Декоратор: ETag и Last-Modified из меток лент.
+
+    ``keys_func`` получает именованные аргументы представления и
+    возвращает список ключей меток или None, если условный ответ
+    невозможен (например, объекта нет).
+    """
+    def etag(request, *args, **kwargs):
+        return _state(request, keys_func, kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return _state(request, keys_func, kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
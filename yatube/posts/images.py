@@ -0,0 +1,151 @@
+"""Обработка загруженных изображений постов.
+
+Снимок с телефона (12 МБ, 4000×3000, EXIF с координатами) заменяется
+копией, у которой большая сторона не больше ``IMAGE_MAX_SIDE``,
+перекодированной в ``IMAGE_FORMAT`` — прогрессивный JPEG или WebP —
+без метаданных. Поворот из EXIF применяется до того, как метаданные
+отбрасываются. Ширина, высота и размер файла записываются в пост.
+
+Обработка идёт после коммита в пуле миниатюр (posts.thumbnails), и
+миниатюра готовится уже по уменьшенной копии. Анимацию и небольшие
+файлы без метаданных, которые перекодирование не уменьшает, обработка
+оставляет как есть и только записывает их размеры.
+"""
+import io
+import logging
+import math
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from . import thumbnails
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+
+
+def output_format():
+    """Формат копий; без поддержки WebP в Pillow — JPEG."""
+    format = settings.IMAGE_FORMAT.upper()
+    if format == 'WEBP' and not features.check('webp'):
+        logger.warning('Pillow собран без WebP, копии сохраняются в JPEG')
+        return 'JPEG'
+    return format
+
+
+def _flatten(image):
+    """RGB для JPEG: прозрачность накладывается на белый фон."""
+    if image.mode == 'RGB':
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def encode(source, max_side=None, format=None, quality=None):
+    """Уменьшенная копия файла без метаданных.
+
+    Возвращает (байты или None, ширина, высота); None — оставить
+    оригинал: анимацию или файл без метаданных, который не нужно
+    уменьшать и копия которого не меньше его самого.
+    """
+    max_side = max_side or settings.IMAGE_MAX_SIDE
+    format = format or output_format()
+    quality = quality or settings.IMAGE_QUALITY
+    original = source.read()
+    with Image.open(io.BytesIO(original)) as image:
+        if getattr(image, 'is_animated', False):
+            return None, image.width, image.height
+        scale = min(max_side / max(image.size), 1)
+        metadata = bool(image.getexif()) or 'icc_profile' in image.info
+        # JPEG декодируется сразу в уменьшенном в 2–8 раз масштабе.
+        image.draft('RGB', tuple(
+            math.ceil(side * scale) for side in image.size
+        ))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+        if format == 'JPEG':
+            image = _flatten(image)
+            options = {'optimize': True, 'progressive': True}
+        else:
+            options = {'method': 4}
+        output = io.BytesIO()
+        image.save(output, format, quality=quality, **options)
+    data = output.getvalue()
+    if scale == 1 and not metadata and len(data) >= len(original):
+        return None, image.width, image.height
+    return data, image.width, image.height
+
+
+def copy_name(name):
+    """Имя копии: расширение выходного формата."""
+    return os.path.splitext(name)[0] + EXTENSIONS[output_format()]
+
+
+def prepare(source, name):
+    """Файл для хранилища: (имя, содержимое, ширина, высота, размер).
+    Если копия не нужна, содержимое — исходные байты под прежним именем.
+    """
+    data, width, height = encode(source)
+    if data is None:
+        source.seek(0)
+        data = source.read()
+    else:
+        name = copy_name(name)
+    return name, ContentFile(data), width, height, len(data)
+
+
+def ingest(name):
+    """Обрабатывает загруженный файл и переводит на копию его посты.
+
+    Возвращает имя файла, которое теперь у постов.
+    """
+    from . import freshness
+    from .models import Post
+
+    with default_storage.open(name) as source:
+        data, width, height = encode(source)
+    if data is None:
+        new_name, size = name, default_storage.size(name)
+    else:
+        # Копия всегда получает новое имя, даже с тем же расширением:
+        # хранилище добавит суффикс, а оригинал удаляется ниже.
+        new_name = default_storage.save(copy_name(name), ContentFile(data))
+        size = len(data)
+    posts = Post.objects.filter(image=name)
+    posts.update(
+        image=new_name,
+        image_width=width,
+        image_height=height,
+        image_size=size,
+        updated=timezone.now(),
+    )
+    if new_name != name:
+        default_storage.delete(name)
+    freshness.touch_posts(Post.objects.filter(image=new_name))
+    return new_name
+
+
+def process(name):
+    """Фоновая задача загрузки: копия, затем миниатюра по ней."""
+    try:
+        name = ingest(name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+    return thumbnails.generate(name)
+
+
+def schedule(name):
+    """Ставит обработку загруженного файла в очередь после коммита."""
+    if not name:
+        return
+    if settings.IMAGE_INGEST:
+        thumbnails.submit(process, name)
+    else:
+        thumbnails.schedule(name)
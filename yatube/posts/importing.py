@@ -0,0 +1,298 @@
+"""Массовый импорт постов, комментариев и подписок.
+
+Записи читаются из JSONL или CSV потоком и вставляются пачками через
+bulk_create, без сигналов на каждую строку. Авторы и группы ищутся в
+словарях, загруженных один раз, картинки копируются в хранилище
+параллельно. Счётчики, ленты подписок и поисковый индекс
+пересчитываются один раз в конце.
+
+Поля записей:
+
+* post — ``author``, ``text``, ``group`` (slug), ``pub_date``,
+  ``image`` (путь к файлу), ``id``;
+* comment — ``post`` (id), ``author``, ``text``, ``pub_date``;
+* follow — ``user``, ``author``.
+
+Картинки уменьшаются и перекодируются так же, как загруженные через
+форму (posts.images). Ошибочная запись пропускается и попадает в отчёт
+с номером строки.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from search.engine import index_all
+
+from . import freshness
+from .bulk import (
+    BATCH_SIZE, chunked, insert, last_pk, rendered, restore_dates,
+    saved_dates,
+)
+from .counters import reconcile_counters
+from .images import prepare
+from .models import Comment, Follow, Group, Post, User
+from .timeline import add_follows, fan_out_posts
+
+FORMATS = ('jsonl', 'csv')
+KINDS = ('post', 'comment', 'follow')
+IMAGE_WORKERS = 4
+
+
+class RowError(ValueError):
+    """Запись нельзя импортировать."""
+
+
+def read_records(file, file_format='jsonl'):
+    """Пары (номер строки, запись или RowError) из открытого файла."""
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(file), 2):
+            yield number, {
+                key: value for key, value in row.items() if value
+            }
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            record = RowError(f'некорректный JSON: {error}')
+        if not isinstance(record, (dict, RowError)):
+            record = RowError('запись должна быть объектом')
+        yield number, record
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise RowError(f'некорректная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _integer(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{field} должно быть числом: {value}')
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value in (None, ''):
+        raise RowError(f'нет поля {field}')
+    return value
+
+
+class Importer:
+    """Импорт записей одного вида; ``run`` возвращает отчёт."""
+
+    def __init__(self, kind, batch_size=BATCH_SIZE, create_users=False,
+                 image_root=''):
+        if kind not in KINDS:
+            raise ValueError(f'Неизвестный вид записей: {kind}')
+        self.kind = kind
+        self.batch_size = batch_size
+        self.create_users = create_users
+        self.image_root = image_root
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.ids = []
+        self.errors = []
+        self.created_users = 0
+
+    def run(self, records):
+        first_follow = last_pk(Follow)
+        with transaction.atomic():
+            with ThreadPoolExecutor(IMAGE_WORKERS) as self.executor:
+                for chunk in chunked(records, self.batch_size):
+                    self.import_chunk(chunk)
+            self.rebuild(first_follow)
+        freshness.touch_all()
+        return {
+            'imported': len(self.ids),
+            'created_users': self.created_users,
+            'errors': self.errors,
+        }
+
+    def import_chunk(self, chunk):
+        valid = []
+        for number, record in chunk:
+            if isinstance(record, RowError):
+                self.errors.append((number, str(record)))
+            else:
+                valid.append((number, record))
+        if self.create_users:
+            self.add_missing_users(record for _, record in valid)
+        build = getattr(self, f'build_{self.kind}')
+        context = self.chunk_context([record for _, record in valid])
+        built = []
+        for number, record in valid:
+            try:
+                built.append((number, build(record, context)))
+            except RowError as error:
+                self.errors.append((number, str(error)))
+        if self.kind == 'post':
+            built = self.store_images(built)
+        self.insert([obj for _, obj in built])
+
+    def insert(self, objects):
+        """Вставляет пачку, запоминает pk новых строк и возвращает им
+        даты из записей.
+        """
+        if not objects:
+            return
+        model = type(objects[0])
+        explicit = {obj.pk for obj in objects if obj.pk is not None}
+        dates = saved_dates(model, objects)
+        last = last_pk(model)
+        model.objects.bulk_create(
+            objects, ignore_conflicts=model is Follow
+        )
+        new = set(
+            model.objects.filter(pk__gt=last).values_list('pk', flat=True)
+        )
+        if dates:
+            # Автоинкремент выдаёт pk строкам без явного id по порядку.
+            generated = iter(sorted(new - explicit))
+            restore_dates(model, [
+                obj.pk if obj.pk in explicit else next(generated)
+                for obj in objects
+            ], dates)
+        self.ids.extend(sorted(explicit | new))
+
+    def user(self, username):
+        if username not in self.users:
+            raise RowError(f'нет пользователя {username}')
+        return self.users[username]
+
+    def add_missing_users(self, records):
+        fields = ('author', 'user')
+        missing = {
+            record[field] for record in records for field in fields
+            if record.get(field) and record[field] not in self.users
+        }
+        if not missing:
+            return
+        password = make_password(None)
+        insert(User, (
+            User(username=username, password=password)
+            for username in sorted(missing)
+        ), self.batch_size)
+        self.users.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'pk'
+            )
+        )
+        self.created_users += len(missing)
+
+    def chunk_context(self, records):
+        """pk упомянутых в пачке постов, которые уже есть в базе: один
+        запрос на пачку вместо запроса на запись.
+        """
+        field = {'post': 'id', 'comment': 'post'}.get(self.kind)
+        ids = [
+            record[field] for record in records
+            if field and str(record.get(field, '')).isdigit()
+        ]
+        if not ids:
+            return set()
+        return set(
+            Post.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+
+    def build_post(self, record, existing):
+        post_id = record.get('id')
+        if post_id:
+            post_id = _integer(post_id, 'id')
+            if post_id in existing:
+                raise RowError(f'пост {post_id} уже есть')
+            existing.add(post_id)
+        slug = record.get('group')
+        if slug and slug not in self.groups:
+            raise RowError(f'нет группы {slug}')
+        date = _date(record.get('pub_date'))
+        post = Post(
+            id=post_id or None,
+            author_id=self.user(_required(record, 'author')),
+            group_id=self.groups.get(slug),
+            text=_required(record, 'text'),
+            pub_date=date,
+            updated=date,
+        )
+        post.source_image = record.get('image')
+        return rendered(post)
+
+    def build_comment(self, record, existing):
+        post_id = _integer(_required(record, 'post'), 'post')
+        if post_id not in existing:
+            raise RowError(f'нет поста {post_id}')
+        return rendered(Comment(
+            post_id=post_id,
+            author_id=self.user(_required(record, 'author')),
+            text=_required(record, 'text'),
+            pub_date=_date(record.get('pub_date')),
+        ))
+
+    def build_follow(self, record, context):
+        user = self.user(_required(record, 'user'))
+        author = self.user(_required(record, 'author'))
+        if user == author:
+            raise RowError('подписка на самого себя')
+        return Follow(user_id=user, author_id=author)
+
+    def save_image(self, path):
+        """Уменьшает картинку и сохраняет; возвращает (имя, ширина,
+        высота, размер).
+        """
+        with open(os.path.join(self.image_root, path), 'rb') as source:
+            name, content, *metadata = prepare(
+                source, f'posts/{os.path.basename(path)}'
+            )
+        return (default_storage.save(name, content), *metadata)
+
+    def store_images(self, built):
+        """Копирует картинки пачки параллельно; посты с недоступной
+        картинкой попадают в ошибки.
+        """
+        futures = [
+            post.source_image
+            and self.executor.submit(self.save_image, post.source_image)
+            for _, post in built
+        ]
+        stored = []
+        for (number, post), future in zip(built, futures):
+            if future:
+                try:
+                    (post.image, post.image_width, post.image_height,
+                     post.image_size) = future.result()
+                except (OSError, ValueError) as error:
+                    self.errors.append((number, f'картинка: {error}'))
+                    continue
+            stored.append((number, post))
+        return stored
+
+    def rebuild(self, first_follow):
+        """Производные данные — один раз на весь импорт."""
+        if self.kind == 'post':
+            fan_out_posts(self.ids)
+        elif self.kind == 'follow':
+            add_follows(first_follow)
+        if self.kind in ('post', 'comment'):
+            model = Post if self.kind == 'post' else Comment
+            for chunk in chunked(self.ids, self.batch_size):
+                index_all(
+                    self.kind, model.objects.filter(pk__in=chunk),
+                    self.batch_size,
+                )
+        reconcile_counters()
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from posts.bulk import BATCH_SIZE
+from posts.models import Comment, Post, render_text
+
+
+def backfill(model, batch_size, force=False):
+    """Считает text_html пачками по возрастанию pk; возвращает число
+    обновлённых строк.
+
+    bulk_update не трогает поле updated, поэтому кеш карточек остаётся
+    действительным: HTML совпадает с прежним выводом шаблонов.
+    """
+    queryset = model.objects.order_by('pk')
+    if not force:
+        queryset = queryset.filter(text_html='')
+    last = 0
+    total = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).only('pk', 'text')[
+            :batch_size
+        ])
+        if not batch:
+            return total
+        for obj in batch:
+            obj.text_html = render_text(obj.text)
+        model.objects.bulk_update(batch, ['text_html'])
+        total += len(batch)
+        last = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = 'Заполняет HTML текста постов и комментариев пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересчитать и уже заполненные строки.',
+        )
+
+    def handle(self, *args, **options):
+        for model in (Post, Comment):
+            total = backfill(model, options['batch_size'], options['force'])
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обновлено {total}'
+            )
+        self.stdout.write(self.style.SUCCESS('HTML текстов заполнен'))
@@ -0,0 +1,137 @@
+import io
+import os
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageOps
+
+from core.bench import report, write_report
+from posts import images, thumbnails
+
+PHOTO_SIZE = (4032, 3024)
+EXIF_ORIENTATION = 0x0112
+
+
+def _photo(seed):
+    """Снимок «с телефона»: крупный JPEG высокого качества с шумом
+    сенсора и EXIF.
+    """
+    rng = random.Random(seed)
+    colors = [tuple(rng.randrange(256) for _ in 'rgb') for _ in '12']
+    image = ImageOps.colorize(
+        Image.linear_gradient('L').resize(PHOTO_SIZE), *colors
+    )
+    noise = Image.effect_noise(PHOTO_SIZE, 24).convert('RGB')
+    image = Image.blend(image, noise, 0.25)
+    exif = Image.Exif()
+    exif[EXIF_ORIENTATION] = 6
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=95, exif=exif.tobytes())
+    return output.getvalue()
+
+
+def _sources(options):
+    if not options['source']:
+        return [
+            (f'photo_{number}.jpg', _photo(number))
+            for number in range(options['count'])
+        ]
+    sources = []
+    for name in sorted(os.listdir(options['source'])):
+        path = os.path.join(options['source'], name)
+        if os.path.isfile(path):
+            with open(path, 'rb') as source:
+                sources.append((name, source.read()))
+    if not sources:
+        raise CommandError('В каталоге нет файлов.')
+    return sources
+
+
+def _timed(function, *args, repeat=1):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def _encode(data):
+    return images.encode(io.BytesIO(data))
+
+
+def _decode(data):
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+
+
+def _thumbnail(data):
+    """Примерно то, что делает sorl для карточки: crop до GEOMETRY."""
+    width, height = map(int, thumbnails.GEOMETRY.split('x'))
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (width, height))
+        ImageOps.fit(image, (width, height), Image.LANCZOS)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает исходные изображения и их копии после обработки при '
+        'загрузке (posts/images.py): размер файла, время обработки, '
+        'декодирования и создания миниатюры. Без --source замеряет '
+        'синтетические снимки 4032×3024.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', help='Каталог с изображениями.')
+        parser.add_argument(
+            '--count', type=int, default=5,
+            help='Синтетических снимков без --source.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Повторов каждого замера времени.',
+        )
+        parser.add_argument('--output', help='Файл для отчёта в JSON.')
+
+    def handle(self, *args, **options):
+        repeat = max(options['repeat'], 1)
+        results = []
+        for name, original in _sources(options):
+            ingest, (data, width, height) = _timed(
+                _encode, original, repeat=repeat
+            )
+            processed = data or original
+            row = {
+                'image': name,
+                'original_bytes': len(original),
+                'processed_bytes': len(processed),
+                'width': width,
+                'height': height,
+                'ingest_ms': _ms(ingest),
+            }
+            for label, content in (('original', original),
+                                   ('processed', processed)):
+                decode, _ = _timed(_decode, content, repeat=repeat)
+                thumbnail, _ = _timed(_thumbnail, content, repeat=repeat)
+                row[f'{label}_decode_ms'] = _ms(decode)
+                row[f'{label}_thumbnail_ms'] = _ms(thumbnail)
+            results.append(row)
+            self.stderr.write(
+                f'{name}: {len(original)} → {len(processed)} байт, '
+                f'декодирование {row["original_decode_ms"]} → '
+                f'{row["processed_decode_ms"]} мс'
+            )
+        params = {
+            'repeat': repeat,
+            'format': images.output_format(),
+            'max_side': settings.IMAGE_MAX_SIDE,
+            'quality': settings.IMAGE_QUALITY,
+            'source': options['source'] or 'synthetic',
+        }
+        write_report(
+            report('images', params, results), options['output'], self.stdout
+        )
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporting import (
+    CHUNK_SIZE, FORMATS, export_lines, export_records
+)
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы с комментариями в JSONL или '
+        'CSV, не загружая их в память целиком. Прерванную выгрузку '
+        'можно продолжить с --after.'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--author', help='Имя пользователя.')
+        source.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument(
+            '--after', type=int,
+            help='id последнего выгруженного поста; файл --output '
+                 'дописывается.',
+        )
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию stdout.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def posts(self, options):
+        if options['author']:
+            if not User.objects.filter(username=options['author']).exists():
+                raise CommandError(f'Нет пользователя {options["author"]}')
+            return Post.objects.filter(author__username=options['author'])
+        if not Group.objects.filter(slug=options['group']).exists():
+            raise CommandError(f'Нет группы {options["group"]}')
+        return Post.objects.filter(group__slug=options['group'])
+
+    def handle(self, *args, **options):
+        self.last_id = options['after']
+        records = export_records(
+            self.posts(options), options['after'], options['chunk_size']
+        )
+        lines = export_lines(
+            self.track(records), options['format'],
+            header=options['after'] is None,
+        )
+        output = None
+        if options['output']:
+            mode = 'w' if options['after'] is None else 'a'
+            output = open(
+                options['output'], mode, encoding='utf-8', newline=''
+            )
+        try:
+            for line in lines:
+                if output is None:
+                    self.stdout.write(line, ending='')
+                else:
+                    output.write(line)
+        finally:
+            if output is not None:
+                output.close()
+            self.stderr.write(
+                f'Последний выгруженный пост: {self.last_id}; продолжить '
+                f'можно с --after {self.last_id}'
+                if self.last_id else 'Постов не выгружено'
+            )
+
+    def track(self, records):
+        """Запоминает id поста, как только он полностью записан."""
+        for record in records:
+            yield record
+            self.last_id = record['id']
@@ -0,0 +1,68 @@
+import os
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.bulk import BATCH_SIZE
+from posts.importing import FORMATS, KINDS, Importer, read_records
+
+# Сколько ошибочных записей показать в отчёте.
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты, комментарии или подписки из JSONL или CSV '
+        'пачками через bulk_create. Счётчики, ленты и поиск '
+        'пересчитываются один раз в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями; - для stdin.')
+        parser.add_argument('--kind', choices=KINDS, default='post')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='По умолчанию — по расширению файла.',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных пользователей без пароля.',
+        )
+        parser.add_argument(
+            '--image-root',
+            help='Каталог, от которого считаются пути картинок; по '
+                 'умолчанию — каталог файла.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'jsonl'
+        )
+        image_root = options['image_root'] or (
+            os.path.dirname(os.path.abspath(path)) if path != '-' else ''
+        )
+        importer = Importer(
+            options['kind'],
+            batch_size=options['batch_size'],
+            create_users=options['create_users'],
+            image_root=image_root,
+        )
+        # Закрывается только файл, открытый командой, но не stdin.
+        try:
+            source = (
+                nullcontext(sys.stdin) if path == '-'
+                else open(path, encoding='utf-8', newline='')
+            )
+        except OSError as error:
+            raise CommandError(error)
+        with source as file:
+            result = importer.run(read_records(file, file_format))
+        for number, message in result['errors'][:SHOWN_ERRORS]:
+            self.stderr.write(f'строка {number}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано: {result["imported"]}, новых пользователей: '
+            f'{result["created_users"]}, ошибок: {len(result["errors"])}'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Уменьшает и перекодирует изображения постов, загруженные до '
+        'обработки при загрузке, и записывает их размеры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, help='Обработать не больше файлов.',
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.filter(image_size__isnull=True).exclude(
+            image=''
+        ).order_by('image').values_list('image', flat=True).distinct()
+        if options['limit']:
+            names = names[:options['limit']]
+        done = failed = 0
+        for name in list(names):
+            try:
+                new_name = images.ingest(name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            thumbnails.generate(new_name)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {done}, с ошибками: {failed}'
+        ))
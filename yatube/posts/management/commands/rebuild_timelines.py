@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import freshness
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает ленты подписок для существующих данных.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = rebuild_timelines()
+        freshness.touch_counts(freshness.ALL)
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах: {total}')
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с фактическими данными.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile_counters()
+        for name, total in fixed.items():
+            self.stdout.write(f'{name}: исправлено {total}')
+        self.stdout.write(self.style.SUCCESS('Счётчики сверены'))
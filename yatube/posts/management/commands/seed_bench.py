@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.seeding import BATCH_SIZE, PASSWORD, generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, постами '
+        'с картинками, комментариями и подписками для нагрузочных '
+        'замеров. Одинаковый --seed даёт одинаковые данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            created = generate(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                image_share=options['image_share'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                log=self.stderr.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        summary = ', '.join(f'{key} {value}' for key, value in created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {summary}. Пароль пользователей: {PASSWORD}'
+        ))
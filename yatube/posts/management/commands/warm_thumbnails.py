@@ -0,0 +1,59 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import backend, generate, GEOMETRY, OPTIONS
+
+
+def _setup_worker():
+    django.setup()
+
+
+def _warm(names):
+    try:
+        return sum(generate(name) for name in names)
+    finally:
+        connections.close_all()
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры постов на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Количество процессов (по умолчанию — по числу ядер).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=50,
+            help='Сколько изображений отдаётся процессу за раз.'
+        )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        missing = [
+            name for name in images.iterator()
+            if backend.cached_thumbnail(name, GEOMETRY, **OPTIONS) is None
+        ]
+        # Соединения с базой не должны переходить в дочерние процессы.
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=_setup_worker
+        ) as pool:
+            created = sum(
+                pool.map(_warm, _chunks(missing, options['chunk_size']))
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано миниатюр: {created} из {len(missing)}'
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, help_text='Меняется и при правке группы или автора поста', verbose_name='Дата изменения'),
+        ),
+    ]
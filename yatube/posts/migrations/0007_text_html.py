@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_post_updated'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Экранированный текст с абзацами, считается при сохранении', verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, help_text='Экранированный текст с абзацами, считается при сохранении', verbose_name='Текст в HTML'),
+        ),
+    ]
@@ -1,10 +1,19 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils.html import linebreaks
+from django.utils.safestring import mark_safe
 
 
 User = get_user_model()
 
 
+def render_text(text):
+    """Текст поста или комментария в HTML: то же, что фильтр linebreaks
+    с автоэкранированием.
+    """
+    return linebreaks(text, autoescape=True)
+
+
 class CreatedModel(models.Model):
     """Абстрактная модель. Добавляет дату создания и дату."""
     pub_date = models.DateTimeField(
@@ -16,6 +25,12 @@ class CreatedModel(models.Model):
         on_delete=models.CASCADE,
         verbose_name='Автор'
     )
+    text_html = models.TextField(
+        'Текст в HTML',
+        blank=True,
+        editable=False,
+        help_text='Экранированный текст с абзацами, считается при сохранении'
+    )
 
     class Meta:
         abstract = True
@@ -24,6 +39,18 @@ class CreatedModel(models.Model):
     def __str__(self) -> str:
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        self.text_html = render_text(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'text_html'}
+        super().save(*args, **kwargs)
+
+    @property
+    def html(self):
+        """Готовый HTML текста; у не пересчитанных строк — на лету."""
+        return mark_safe(self.text_html or render_text(self.text))
+
 
 class Group(models.Model):
     """Параметры добавления новых групп."""
@@ -31,6 +58,11 @@ class Group(models.Model):
     title = models.CharField('Название', max_length=200)
     slug = models.SlugField('URL', unique=True,)
     description = models.TextField('Описание')
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         """Сортировка по названию."""
@@ -63,6 +95,34 @@ class Post(CreatedModel):
         upload_to='posts/',
         blank=True
     )
+    # Заполняются после обработки загруженного файла (posts/images.py).
+    # width_field/height_field ImageField не подходят: они открывают
+    # файл при загрузке каждого поста, у которого размеров ещё нет.
+    image_width = models.PositiveIntegerField(
+        'Ширина изображения',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота изображения',
+        null=True,
+        editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер изображения в байтах',
+        null=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Меняется и при правке группы или автора поста'
+    )
 
     class Meta:
         """Сортировка по дате убывания."""
@@ -71,6 +131,22 @@ class Post(CreatedModel):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         default_related_name = 'posts'
+        indexes = [
+            models.Index(fields=('pub_date',), name='post_feed_idx'),
+            models.Index(
+                fields=('group', 'pub_date'), name='post_group_feed_idx'),
+            models.Index(
+                fields=('author', 'pub_date'), name='post_author_feed_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженные поля, за сменой которых следят сигналы."""
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_updated = instance.__dict__.get('updated')
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
 
 
 class Comment(CreatedModel):
@@ -90,6 +166,10 @@ class Comment(CreatedModel):
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         default_related_name = "comments"
+        indexes = [
+            models.Index(
+                fields=('post', 'pub_date'), name='comment_post_feed_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -122,3 +202,73 @@ class Follow(models.Model):
 
     def __str__(self):
         return f"Подписчик: '{self.user}' на автора: '{self.author}'"
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами при записи постов и подписок, сверяются
+    командой ``reconcile_counters``.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+    def __str__(self):
+        return f"Счётчики '{self.user}'"
+
+
+class Timeline(models.Model):
+    """Материализованная лента подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    страница «Избранные авторы» читается одним диапазоном индекса.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timelines',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_post'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', 'pub_date', 'post'),
+                name='timeline_user_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"Лента '{self.user}': пост {self.post_id}"
@@ -0,0 +1,221 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Одинаковые параметры и ``seed`` дают одинаковые данные. Строки
+вставляются пачками через bulk_create, минуя сигналы, поэтому счётчики
+считаются здесь же, а ленты подписок и поисковый индекс достраиваются
+в конце. Популярность авторов и групп распределена по закону Ципфа:
+немногим достаётся большая часть постов и подписчиков.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageOps
+
+from search.engine import index_all
+
+from . import freshness
+from .bulk import BATCH_SIZE, insert, last_pk, rendered
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+from .timeline import add_follows
+
+# Посты с картинками делят между собой небольшой набор файлов.
+IMAGES = 16
+IMAGE_SIZE = (960, 640)
+# Тексты собираются из заранее созданных предложений: Faker на каждый
+# пост работал бы дольше самой вставки.
+SENTENCES = 2000
+GROUPED_SHARE = 0.7
+PERIOD = timedelta(days=365)
+# Пароль всех созданных пользователей.
+PASSWORD = 'bench-password'
+
+
+def _zipf(count):
+    """Накопленные веса 1/ранг для random.choices."""
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+def _images(count):
+    """Имена файлов общего набора картинок; недостающие создаются."""
+    names = []
+    for number in range(count):
+        name = f'posts/bench/bench_{number}.jpg'
+        if not default_storage.exists(name):
+            rng = random.Random(number)
+            colors = [tuple(rng.randrange(256) for _ in 'rgb') for _ in '12']
+            image = ImageOps.colorize(
+                Image.linear_gradient('L').resize(IMAGE_SIZE), *colors
+            )
+            content = BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            name = default_storage.save(name, ContentFile(content.getvalue()))
+        names.append(name)
+    return names
+
+
+def _follow_pairs(rng, user_ids, ranked, count):
+    """Уникальные пары (подписчик, автор) без подписок на себя."""
+    if count > len(user_ids) * (len(user_ids) - 1) // 2:
+        raise ValueError('Подписок больше, чем пар пользователей.')
+    weights = _zipf(len(ranked))
+    pairs = {}
+    while len(pairs) < count:
+        authors = rng.choices(ranked, cum_weights=weights, k=count)
+        for author in authors:
+            user = rng.choice(user_ids)
+            if user != author:
+                pairs.setdefault((user, author))
+            if len(pairs) == count:
+                break
+    return list(pairs)
+
+
+def generate(users=1000, groups=50, posts=10000, comments=30000,
+             follows=20000, image_share=0.3, seed=0, batch_size=BATCH_SIZE,
+             log=None):
+    """Создаёт данные и возвращает количество строк по видам."""
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+    now = timezone.now()
+    start = now - PERIOD
+    with transaction.atomic():
+        offset = last_pk(User)
+        password = make_password(PASSWORD)
+        user_ids = insert(User, (
+            User(
+                username=f'{fake.user_name()}_{offset + number}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+                date_joined=start,
+            )
+            for number in range(users)
+        ), batch_size)
+        ranked = rng.sample(user_ids, len(user_ids))
+        log(f'Пользователей: {len(user_ids)}')
+
+        # План постов: автор, группа и число комментариев известны до
+        # вставки, чтобы сразу записать счётчики.
+        post_authors = rng.choices(ranked, cum_weights=_zipf(users), k=posts)
+        group_weights = _zipf(groups)
+        post_groups = [
+            rng.choices(range(groups), cum_weights=group_weights)[0]
+            if groups and rng.random() < GROUPED_SHARE else None
+            for _ in range(posts)
+        ]
+        # Свежие посты комментируют чаще.
+        comment_targets = sorted(
+            posts - 1 - int(posts * rng.random() ** 3)
+            for _ in range(comments if posts else 0)
+        )
+        comments_count = Counter(comment_targets)
+        group_posts = Counter(post_groups)
+
+        offset = last_pk(Group)
+        group_ids = insert(Group, (
+            Group(
+                title=fake.sentence(nb_words=3).rstrip('.')[:200],
+                slug=f'bench-{offset + number}',
+                description=fake.paragraph(),
+                posts_count=group_posts[number],
+            )
+            for number in range(groups)
+        ), batch_size)
+        log(f'Групп: {len(group_ids)}')
+
+        sentences = [fake.sentence() for _ in range(SENTENCES)]
+        images = _images(IMAGES) if image_share else []
+
+        def text(longest):
+            return ' '.join(rng.choices(sentences, k=rng.randint(1, longest)))
+
+        dates = [
+            start + PERIOD * ((number + rng.random()) / posts)
+            for number in range(posts)
+        ]
+        first_post = last_pk(Post)
+        post_ids = insert(Post, (
+            rendered(Post(
+                author_id=post_authors[number],
+                group_id=(
+                    None if post_groups[number] is None
+                    else group_ids[post_groups[number]]
+                ),
+                text=text(6),
+                image=(
+                    rng.choice(images) if rng.random() < image_share else ''
+                ),
+                comments_count=comments_count[number],
+                pub_date=dates[number],
+                updated=dates[number],
+            ))
+            for number in range(posts)
+        ), batch_size)
+        for name in images:
+            Post.objects.filter(image=name).update(
+                image_width=IMAGE_SIZE[0],
+                image_height=IMAGE_SIZE[1],
+                image_size=default_storage.size(name),
+            )
+        log(f'Постов: {len(post_ids)}')
+
+        first_comment = last_pk(Comment)
+        insert(Comment, (
+            rendered(Comment(
+                post_id=post_ids[number],
+                author_id=rng.choice(user_ids),
+                text=text(3),
+                pub_date=dates[number] + (now - dates[number]) * (
+                    rng.random() ** 4
+                ),
+            ))
+            for number in comment_targets
+        ), batch_size)
+        log(f'Комментариев: {comments}')
+
+        pairs = _follow_pairs(rng, user_ids, ranked, follows)
+        first_follow = last_pk(Follow)
+        insert(Follow, (
+            Follow(user_id=user, author_id=author) for user, author in pairs
+        ), batch_size)
+        followers = Counter(author for _, author in pairs)
+        following = Counter(user for user, _ in pairs)
+        author_posts = Counter(post_authors)
+        insert(AuthorStats, (
+            AuthorStats(
+                user_id=user_id,
+                posts_count=author_posts[user_id],
+                followers_count=followers[user_id],
+                following_count=following[user_id],
+            )
+            for user_id in user_ids
+        ), batch_size)
+        log(f'Подписок: {len(pairs)}')
+
+        entries = add_follows(first_follow)
+        log(f'Записей в лентах: {entries}')
+        index_all('post', Post.objects.filter(pk__gt=first_post), batch_size)
+        index_all(
+            'comment', Comment.objects.filter(pk__gt=first_comment),
+            batch_size,
+        )
+        log('Поисковый индекс дополнен')
+    freshness.touch_all()
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': len(post_ids),
+        'comments': comments,
+        'follows': len(pairs),
+    }
@@ -0,0 +1,142 @@
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cards, counters, deleting, freshness, images, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые выводятся в карточке поста.
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def _card_values(user):
+    """Загруженные значения полей карточки; отложенные — None."""
+    return tuple(user.__dict__.get(field) for field in sorted(
+        CARD_USER_FIELDS
+    ))
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._loaded_card = _card_values(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Новому пользователю заводятся счётчики. Карточки его постов
+    устаревают, только если изменилось имя: сохранение last_login или
+    пароля их не трогает.
+    """
+    if raw:
+        return
+    card = _card_values(instance)
+    loaded, instance._loaded_card = instance._loaded_card, card
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not CARD_USER_FIELDS & set(
+        update_fields
+    ):
+        return
+    if card != loaded:
+        Post.objects.filter(author=instance).update(updated=timezone.now())
+        freshness.touch(freshness.ALL)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    """Правка группы меняет версию карточек её постов."""
+    if not created and not raw:
+        Post.objects.filter(group=instance).update(updated=timezone.now())
+        freshness.touch(freshness.ALL)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков и в счётчики,
+    изменённый — убирает из кеша карточки прежней версии. Новое
+    изображение в фоне уменьшается и получает миниатюру.
+    """
+    if raw:
+        return
+    image = instance.image.name
+    if image and image != getattr(instance, '_loaded_image', None):
+        images.schedule(image)
+    instance._loaded_image = image
+    if created:
+        freshness.touch_counts(
+            'index', *freshness.follow_feed_keys(timeline.fan_out(instance))
+        )
+        counters.shift_author(instance.author_id, 'posts_count', 1)
+        counters.shift_group(instance.group_id, 1)
+        freshness.touch_post(instance)
+    else:
+        loaded = getattr(instance, '_loaded_group_id', instance.group_id)
+        if loaded != instance.group_id:
+            counters.shift_group(loaded, -1)
+            counters.shift_group(instance.group_id, 1)
+        cards.forget_cards(
+            instance, getattr(instance, '_loaded_updated', None)
+        )
+        freshness.touch_post(instance, loaded)
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_updated = instance.updated
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Комментарии удаляемого поста не сдвигают его счётчик."""
+    deleting.begin(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting.end(instance)
+    freshness.touch_counts('index', *freshness.follow_feed_keys(
+        Follow.objects.filter(author_id=instance.author_id).values_list(
+            'user_id', flat=True
+        )
+    ))
+    cards.forget_cards(instance, instance.updated)
+    counters.shift_author(instance.author_id, 'posts_count', -1)
+    counters.shift_group(instance.group_id, -1)
+    freshness.touch_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.shift_post(instance.post_id, 1)
+    freshness.touch(f'post:{instance.post_id}')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if deleting.in_progress(Post, instance.post_id):
+        return
+    counters.shift_post(instance.post_id, -1)
+    freshness.touch(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    """При подписке в ленту добавляются уже написанные посты."""
+    if created and not raw:
+        timeline.add_author(instance.user_id, instance.author_id)
+        counters.shift_author(instance.author_id, 'followers_count', 1)
+        counters.shift_author(instance.user_id, 'following_count', 1)
+        freshness.touch_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """При отписке посты автора убираются из ленты."""
+    timeline.remove_author(instance.user_id, instance.author_id)
+    counters.shift_author(instance.author_id, 'followers_count', -1)
+    counters.shift_author(instance.user_id, 'following_count', -1)
+    freshness.touch_follow(instance)
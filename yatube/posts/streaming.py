@@ -0,0 +1,71 @@
+"""Потоковая отдача лент.
+
+Страница рендерится с меткой на месте карточек и пагинатора; всё до
+метки (head, шапка, заголовок) уходит клиенту сразу, ещё до подсчёта и
+выборки постов. Затем выбирается страница ленты, карточки уходят по
+мере того как итератор queryset отдаёт посты, и в конце — пагинатор и
+хвост страницы. Ни список постов, ни документ целиком в памяти не
+собираются.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .cards import card_variant, render_cards
+
+MARKER = mark_safe('<!-- yatube:cards -->')
+
+PAGINATOR_TEMPLATE = 'posts/includes/paginator.html'
+
+
+def _chunks(posts, size):
+    posts = iter(posts)
+    chunk = list(islice(posts, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(posts, size))
+
+
+def _stream(request, template_name, context, get_page):
+    html = render_to_string(
+        template_name, dict(context, stream_marker=MARKER), request
+    )
+    prefix, suffix = html.split(MARKER, 1)
+    yield prefix
+    page_obj = get_page()
+    posts = page_obj.object_list
+    if isinstance(posts, QuerySet):
+        posts = posts.iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
+    variant, extra = card_variant(context.get('author'), context.get('group'))
+    separator = ''
+    for chunk in _chunks(posts, settings.STREAMING_CHUNK_SIZE):
+        for card in render_cards(chunk, variant, extra):
+            yield separator + card
+            separator = '<hr>'
+    yield render_to_string(
+        PAGINATOR_TEMPLATE, {'page_obj': page_obj}, request
+    )
+    yield suffix
+
+
+def render_feed(request, template_name, context, get_page):
+    """Страница ленты: обычный render или, при ``STREAMING_FEEDS``,
+    потоковый ответ.
+
+    ``get_page`` возвращает страницу ленты (``page_obj``); в потоковом
+    режиме он вызывается только после отправки шапки. У такого ответа
+    нет ``context`` и нет фрагментного кеша шаблона: карточки и так
+    берутся из кеша пачками.
+    """
+    if not settings.STREAMING_FEEDS:
+        return render(
+            request, template_name, dict(context, page_obj=get_page())
+        )
+    return StreamingHttpResponse(
+        _stream(request, template_name, context, get_page)
+    )
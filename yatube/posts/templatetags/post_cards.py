@@ -0,0 +1,13 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..cards import card_variant, render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Возвращает HTML карточек постов страницы из кеша."""
+    variant, extra = card_variant(context.get('author'), context.get('group'))
+    return [mark_safe(card) for card in render_cards(posts, variant, extra)]
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..exporting import export_lines, export_records
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+POSTS = 5
+
+
+class ExportPostsTest(TestCase):
+    """Потоковая выгрузка постов с комментариями."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='export_author')
+        cls.other = User.objects.create_user(username='export_other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='export_slug', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(POSTS)
+        ]
+        Comment.objects.create(
+            author=cls.other, post=cls.posts[1], text='Комментарий'
+        )
+
+    def test_records_in_chunks(self):
+        """Пачка постов — один запрос комментариев, независимо от числа
+        постов в пачке.
+        """
+        posts = Post.objects.filter(author=self.author)
+        with self.assertNumQueries(4):
+            records = list(export_records(posts, chunk_size=2))
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(records[1]['comments'][0]['text'], 'Комментарий')
+        self.assertEqual(records[0]['group'], 'export_slug')
+
+    def test_resume_after_cursor(self):
+        posts = Post.objects.filter(group=self.group)
+        after = self.posts[2].pk
+        records = list(export_records(posts, after=after))
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in self.posts[3:]],
+        )
+
+    def test_csv(self):
+        """В CSV комментарий — отдельная строка после поста."""
+        text = ''.join(export_lines(
+            export_records(Post.objects.filter(pk=self.posts[1].pk)), 'csv'
+        ))
+        rows = list(csv.DictReader(io.StringIO(text)))
+        self.assertEqual([row['type'] for row in rows], ['post', 'comment'])
+        self.assertEqual(rows[1]['post'], str(self.posts[1].pk))
+
+    def test_download_only_for_author(self):
+        url = reverse('posts:profile_export', args=(self.author.username,))
+        client = Client()
+        client.force_login(self.other)
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_login(self.author)
+        response = client.get(url, {'after': self.posts[3].pk})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(response['Content-Type'].split(';')[0],
+                         'application/x-ndjson')
+        self.assertEqual(json.loads(lines[0])['id'], self.posts[4].pk)
+        self.assertEqual(len(lines), 1)
+
+    def test_command(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            'export_posts', '--group', 'export_slug', stdout=out, stderr=err
+        )
+        self.assertEqual(len(out.getvalue().splitlines()), POSTS)
+        self.assertIn(f'--after {self.posts[-1].pk}', err.getvalue())
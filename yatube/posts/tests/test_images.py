@@ -0,0 +1,106 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import images
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def photo(size=(400, 300), orientation=6):
+    """JPEG с EXIF: поворот на 90° и модель камеры."""
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x0110] = 'Phone'
+    output = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(
+        output, 'JPEG', quality=95, exif=exif.tobytes()
+    )
+    return output.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=100, IMAGE_FORMAT='JPEG'
+)
+class ImageIngestTest(TestCase):
+    """Загруженные изображения уменьшаются и теряют метаданные."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='image_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_encode(self):
+        """Большая сторона ограничена, поворот применён, EXIF снят,
+        JPEG прогрессивный.
+        """
+        data, width, height = images.encode(io.BytesIO(photo()))
+        self.assertEqual((width, height), (75, 100))
+        with Image.open(io.BytesIO(data)) as image:
+            self.assertEqual(image.size, (75, 100))
+            self.assertFalse(image.getexif())
+            self.assertTrue(image.info.get('progressive'))
+
+    def test_small_file_kept(self):
+        """Маленький файл без метаданных остаётся как есть."""
+        data, width, height = images.encode(io.BytesIO(SMALL_GIF))
+        self.assertIsNone(data)
+        self.assertEqual((width, height), (2, 1))
+
+    def test_ingest(self):
+        """Пост переходит на копию, размеры записаны, оригинал удалён."""
+        post = Post.objects.create(author=self.user, text='Пост со снимком')
+        original = default_storage.save('posts/photo.png', ContentFile(
+            photo(size=(300, 200), orientation=1)
+        ))
+        Post.objects.filter(pk=post.pk).update(image=original)
+        name = images.ingest(original)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertTrue(name.endswith('.jpg'))
+        self.assertEqual((post.image_width, post.image_height), (100, 67))
+        self.assertEqual(post.image_size, default_storage.size(name))
+        self.assertFalse(default_storage.exists(original))
+
+    def test_ingest_same_extension(self):
+        """Копия JPEG-файла сохраняется под новым именем: на диске
+        лежит уменьшенный файл без EXIF, а не оригинал.
+        """
+        post = Post.objects.create(author=self.user, text='Снимок в JPEG')
+        original = default_storage.save(
+            'posts/phone.jpg', ContentFile(photo(size=(400, 300)))
+        )
+        Post.objects.filter(pk=post.pk).update(image=original)
+        name = images.ingest(original)
+        post.refresh_from_db()
+        self.assertNotEqual(name, original)
+        self.assertFalse(default_storage.exists(original))
+        with default_storage.open(name) as stored:
+            with Image.open(stored) as image:
+                self.assertEqual(image.size, (75, 100))
+                self.assertFalse(image.getexif())
+        self.assertEqual(
+            (post.image_width, post.image_height), (75, 100)
+        )
+        self.assertEqual(post.image_size, default_storage.size(name))
@@ -0,0 +1,149 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from search.engine import search_ids
+
+from ..counters import reconcile_counters
+from ..importing import Importer, read_records
+from ..models import Comment, Follow, Group, Post, Timeline
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def jsonl(*records):
+    return io.StringIO('\n'.join(json.dumps(record) for record in records))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTest(TestCase):
+    """Массовый импорт пачками с пересчётом производных данных."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='import_author')
+        cls.reader = User.objects.create_user(username='import_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='import_slug', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.source = tempfile.mkdtemp()
+        with open(os.path.join(cls.source, 'small.gif'), 'wb') as image:
+            image.write(SMALL_GIF)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(cls.source, ignore_errors=True)
+
+    def test_import_posts(self):
+        """Посты вставлены пачками, ошибочные строки пропущены, а ленты,
+        счётчики и поиск пересчитаны.
+        """
+        records = jsonl(
+            {'author': 'import_author', 'text': 'Импорт черники',
+             'group': 'import_slug', 'pub_date': '2020-01-02T10:00:00',
+             'image': 'small.gif'},
+            {'author': 'import_author', 'text': 'Второй пост', 'id': 500,
+             'pub_date': '2019-05-06T08:00:00'},
+            {'author': 'nobody', 'text': 'Без автора'},
+            {'author': 'import_author', 'text': 'Нет группы', 'group': 'x'},
+            {'author': 'import_author', 'text': 'Та же картинка',
+             'image': 'missing.gif'},
+        )
+        importer = Importer('post', batch_size=2, image_root=self.source)
+        result = importer.run(read_records(records))
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(
+            [number for number, _ in result['errors']], [3, 4, 5]
+        )
+        post = Post.objects.get(text='Импорт черники')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertEqual(post.updated, post.pub_date)
+        explicit = Post.objects.get(pk=500)
+        self.assertEqual(
+            (explicit.pub_date.year, explicit.updated.year), (2019, 2019)
+        )
+        self.assertTrue(post.image.name.startswith('posts/small'))
+        self.assertTrue(Post.objects.filter(pk=500).exists())
+        self.assertEqual(
+            Timeline.objects.filter(user=self.reader).count(), 2
+        )
+        self.assertEqual(set(reconcile_counters().values()), {0})
+        self.assertTrue(
+            Post.objects.filter(
+                pk=post.pk, id__in=search_ids('post', 'черника')
+            ).exists()
+        )
+
+    def test_import_comments_and_follows(self):
+        """Комментарии и подписки из CSV; новые пользователи
+        создаются по флагу.
+        """
+        post = Post.objects.create(author=self.author, text='Пост')
+        comments = io.StringIO(
+            'post,author,text\n'
+            f'{post.pk},import_reader,Первый\n'
+            f'{post.pk},new_user,Второй\n'
+            '999999,import_reader,Мимо\n'
+        )
+        result = Importer('comment', create_users=True).run(
+            read_records(comments, 'csv')
+        )
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual(result['created_users'], 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 2)
+        follows = io.StringIO(
+            'user,author\n'
+            'new_user,import_author\n'
+            'import_reader,import_author\n'
+            'import_author,import_author\n'
+        )
+        result = Importer('follow').run(read_records(follows, 'csv'))
+        self.assertEqual(len(result['errors']), 1)
+        new_user = User.objects.get(username='new_user')
+        self.assertEqual(new_user.stats.following_count, 1)
+        self.assertTrue(
+            Timeline.objects.filter(user=new_user, post=post).exists()
+        )
+        self.assertEqual(Comment.objects.filter(post=post).count(), 2)
+
+    def test_command(self):
+        path = os.path.join(self.source, 'posts.jsonl')
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(jsonl(
+                {'author': 'import_author', 'text': 'Из команды'}
+            ).getvalue())
+        out = io.StringIO()
+        call_command('import_posts', path, stdout=out, stderr=io.StringIO())
+        self.assertIn('Импортировано: 1', out.getvalue())
+        self.assertTrue(Post.objects.filter(text='Из команды').exists())
+
+    def test_command_stdin(self):
+        """Чтение из ``-`` не закрывает stdin."""
+        stdin = jsonl({'author': 'import_author', 'text': 'Из stdin'})
+        with mock.patch('sys.stdin', stdin):
+            call_command(
+                'import_posts', '-',
+                stdout=io.StringIO(), stderr=io.StringIO(),
+            )
+        self.assertFalse(stdin.closed)
+        self.assertTrue(Post.objects.filter(text='Из stdin').exists())
@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Follow, Group, Post
 
 
 User = get_user_model()
@@ -70,3 +75,164 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     self.group._meta.get_field(field)
                         .verbose_name, expected_value)
+
+
+class CountersTest(TestCase):
+    """Денормализованные счётчики следуют за записью и удалением."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='counter_slug',
+            description='Описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Описание',
+        )
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев учитывают создание,
+        смену группы и удаление поста.
+        """
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(author=self.reader, post=post, text='Да')
+        self.refresh(post, self.group, self.author.stats)
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.refresh(self.group, self.other_group)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.refresh(self.other_group, self.author.stats)
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_follow_counters(self):
+        """Счётчики подписок и подписчиков следуют за подпиской."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.refresh(self.author.stats, self.reader.stats)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        follow.delete()
+        self.refresh(self.author.stats, self.reader.stats)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_delete_user(self):
+        """Удаление пользователя с постами, комментариями и подписками
+        не воскрешает его счётчики и поправляет счётчики остальных.
+        """
+        doomed = User.objects.create_user(username='doomed')
+        post = Post.objects.create(
+            author=doomed, text='Пост', group=self.group
+        )
+        Comment.objects.create(author=self.reader, post=post, text='Да')
+        own = Post.objects.create(author=self.author, text='Чужой пост')
+        Comment.objects.create(author=doomed, post=own, text='Мой')
+        Follow.objects.create(user=doomed, author=self.author)
+        Follow.objects.create(user=self.reader, author=doomed)
+        doomed_id = doomed.pk
+        doomed.delete()
+        connection.check_constraints()
+        self.assertFalse(
+            AuthorStats.objects.filter(user_id=doomed_id).exists()
+        )
+        self.refresh(self.group, own, self.author.stats, self.reader.stats)
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(own.comments_count, 0)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_delete_post_with_comments(self):
+        """Комментарии удаляемого поста не сдвигают его счётчик по
+        одному, а после удаления счётчики других постов снова
+        сдвигаются.
+        """
+        post = Post.objects.create(author=self.author, text='Пост')
+        for number in range(3):
+            Comment.objects.create(
+                author=self.reader, post=post, text=f'Ответ {number}'
+            )
+        other = Post.objects.create(author=self.author, text='Другой')
+        comment = Comment.objects.create(
+            author=self.reader, post=other, text='Останется'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ])
+        comment.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.comments_count, 0)
+
+    def test_reconcile_counters(self):
+        """Команда reconcile_counters исправляет расхождения."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост', group=self.group)
+            for _ in range(3)
+        )
+        AuthorStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', stdout=StringIO())
+        self.refresh(self.group, self.author.stats)
+        self.assertEqual(self.author.stats.posts_count, 3)
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertTrue(AuthorStats.objects.filter(user=self.reader).exists())
+
+
+class TextHtmlTest(TestCase):
+    """HTML текста считается при сохранении, а не при каждом рендере."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='html_author')
+
+    def test_rendered_on_save(self):
+        post = Post.objects.create(
+            author=self.author, text='<b>Первый</b>\n\nВторой'
+        )
+        self.assertEqual(
+            post.text_html,
+            '<p>&lt;b&gt;Первый&lt;/b&gt;</p>\n\n<p>Второй</p>',
+        )
+        post.text = 'Новый текст'
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, '<p>Новый текст</p>')
+        comment = Comment.objects.create(
+            author=self.author, post=post, text='Строка\nещё'
+        )
+        self.assertEqual(comment.text_html, '<p>Строка<br>ещё</p>')
+
+    def test_backfill_text_html(self):
+        """Команда заполняет HTML строк, вставленных без save()."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        )
+        self.assertEqual(Post.objects.filter(text_html='').count(), 3)
+        self.assertEqual(
+            Post.objects.get(text='Пост 2').html, '<p>Пост 2</p>'
+        )
+        call_command(
+            'backfill_text_html', '--batch-size', '2', stdout=StringIO()
+        )
+        self.assertFalse(Post.objects.filter(text_html='').exists())
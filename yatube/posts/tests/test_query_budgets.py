@@ -0,0 +1,171 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from about import urls as about_urls
+from core.cache.config import build_caches
+from core.testing import QueryBudgetExceeded, clear_caches, query_budget
+from users import urls as users_urls
+
+from .. import urls as posts_urls
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+AUTHORS = 4
+GROUPS = 3
+POSTS_PER_AUTHOR = 15
+COMMENTS_PER_POST = 3
+
+# Бюджеты запросов к базе на холодном кеше: (метод, вошёл ли
+# пользователь, бюджет). Сессия и пользователь — два запроса у
+# каждой страницы вошедшего. Лента на странице — постоянное число
+# запросов, сколько бы постов, комментариев и картинок на ней ни было;
+# удаление поста тоже не зависит от числа его комментариев.
+BUDGETS = {
+    'posts:index': ('get', False, 3),
+    'posts:group_list': ('get', False, 3),
+    'posts:profile': ('get', True, 6),
+    'posts:profile_export': ('get', True, 5),
+    'posts:post_detail': ('get', True, 7),
+    'posts:comments': ('get', False, 3),
+    'posts:post_create': ('get', True, 3),
+    'posts:post_edit': ('get', True, 5),
+    'posts:add_comment': ('post', True, 7),
+    'posts:follow_index': ('get', True, 4),
+    'posts:profile_follow': ('get', True, 11),
+    'posts:profile_unfollow': ('get', True, 9),
+    'posts:post_delete': ('get', True, 14),
+    'users:logout': ('get', True, 4),
+    'users:signup': ('get', False, 0),
+    'users:login': ('get', False, 0),
+    'users:password_change': ('get', True, 2),
+    'users:password_change_done': ('get', True, 2),
+    'users:password_reset': ('get', False, 0),
+    'users:password_reset_done': ('get', False, 0),
+    'users:password_reset_confirm': ('get', False, 1),
+    'users:password_reset_complete': ('get', False, 0),
+    'about:author': ('get', False, 0),
+    'about:tech': ('get', False, 0),
+}
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    CACHES=build_caches(
+        'locmem://budgets', 1, namespaces=('posts', 'thumbnails')
+    ),
+)
+class QueryBudgetTest(TestCase):
+    """Каждый адрес укладывается в свой бюджет запросов к базе."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        groups = [
+            Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'budget_{number}',
+                description='Описание',
+            )
+            for number in range(GROUPS)
+        ]
+        authors = [
+            User.objects.create_user(username=f'budget_author_{number}')
+            for number in range(AUTHORS)
+        ]
+        cls.reader = User.objects.create_user(username='budget_reader')
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        Follow.objects.create(user=authors[1], author=authors[0])
+        for number in range(AUTHORS * POSTS_PER_AUTHOR):
+            post = Post.objects.create(
+                author=authors[number % AUTHORS],
+                group=groups[number % GROUPS] if number % 4 else None,
+                text=f'Пост номер {number}',
+                image=SimpleUploadedFile(
+                    f'budget_{number}.gif', SMALL_GIF, 'image/gif'
+                ) if number % 2 else None,
+            )
+            Comment.objects.bulk_create(
+                Comment(
+                    post=post,
+                    author=authors[(number + index) % AUTHORS],
+                    text=f'Комментарий {index}',
+                )
+                for index in range(COMMENTS_PER_POST)
+            )
+        cls.author = authors[1]
+        cls.stranger = authors[2]
+        cls.group = groups[0]
+        cls.post = Post.objects.filter(
+            author=cls.author, group=cls.group
+        ).exclude(image='').first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def url_args(self):
+        post = (self.post.pk,)
+        return {
+            'posts:group_list': (self.group.slug,),
+            'posts:profile': (self.author.username,),
+            'posts:profile_export': (self.author.username,),
+            'posts:post_detail': post,
+            'posts:comments': post,
+            'posts:post_edit': post,
+            'posts:post_delete': post,
+            'posts:add_comment': post,
+            'posts:profile_follow': (self.stranger.username,),
+            'posts:profile_unfollow': (self.stranger.username,),
+            'users:password_reset_confirm': ('MTIz', 'set-password'),
+        }
+
+    def url_names(self):
+        for module in (posts_urls, users_urls, about_urls):
+            for pattern in module.urlpatterns:
+                yield f'{module.app_name}:{pattern.name}'
+
+    def test_every_url_has_budget(self):
+        """Новый адрес без бюджета — ошибка."""
+        self.assertEqual(set(self.url_names()), set(BUDGETS))
+
+    def test_budgets(self):
+        args = self.url_args()
+        for name, (method, logged_in, budget) in BUDGETS.items():
+            with self.subTest(url=name):
+                client = Client()
+                if logged_in:
+                    client.force_login(self.author)
+                clear_caches()
+                url = reverse(name, args=args.get(name, ()))
+                data = {'text': 'Комментарий'} if method == 'post' else {}
+                with query_budget(budget, label=name):
+                    response = getattr(client, method)(url, data)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 400)
+
+    def test_report_shows_repeated_queries(self):
+        """Отчёт помечает запрос, выполненный на каждый элемент."""
+        with self.assertRaises(QueryBudgetExceeded) as error:
+            with query_budget(1, label='N+1'):
+                for post in Post.objects.all()[:3]:
+                    post.author.username
+        report = str(error.exception)
+        self.assertIn('N+1: 4 запросов при бюджете 1 (+3).', report)
+        self.assertRegex(report, r'\+ 3 x SELECT .+ WHERE .+ = \?')
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import clear_caches
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedQueryPlanTest(TestCase):
+    """Запросы лент обслуживаются индексами без сортировки в памяти."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='plan_author')
+        cls.follower = User.objects.create_user(username='plan_follower')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='plan_slug',
+            description='Описание',
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        Comment.objects.create(
+            author=cls.follower,
+            post=cls.post,
+            text='Комментарий',
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', args=(cls.post.id,)),
+            reverse('posts:comments', args=(cls.post.id,)),
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.client = Client()
+        self.client.force_login(self.follower)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_queries_use_indexes(self):
+        """Ни одна выборка с ORDER BY не сортируется через TEMP B-TREE
+        и не сканирует таблицу целиком без индекса.
+        """
+        for url in self.urls:
+            for suffix in ('', '?cursor='):
+                with self.subTest(url=url + suffix):
+                    with CaptureQueriesContext(connection) as queries:
+                        self.client.get(url + suffix)
+                    ordered = [
+                        query['sql'] for query in queries
+                        if query['sql'].startswith('SELECT')
+                        and 'ORDER BY' in query['sql']
+                    ]
+                    for sql in ordered:
+                        plan = self.explain(sql)
+                        self.assertFalse(
+                            any('TEMP B-TREE' in step for step in plan),
+                            f'{sql}\n{plan}'
+                        )
+                        self.assertFalse(
+                            any(
+                                step.startswith('SCAN')
+                                and 'INDEX' not in step
+                                for step in plan
+                            ),
+                            f'{sql}\n{plan}'
+                        )
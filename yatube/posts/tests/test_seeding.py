@@ -0,0 +1,47 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from search.engine import search_ids
+
+from ..counters import reconcile_counters
+from ..models import Comment, Follow, Post, Timeline
+from ..seeding import PERIOD, generate
+from ..timeline import rebuild_timelines
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedBenchTest(TestCase):
+    """Синтетические данные согласованы с денормализованными."""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_generate(self):
+        """Счётчики, ленты и поиск совпадают с пересчётом с нуля."""
+        created = generate(
+            users=6, groups=2, posts=40, comments=50, follows=10,
+            image_share=0.5, seed=1,
+        )
+        self.assertEqual(created['posts'], Post.objects.count())
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 10)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        oldest = Post.objects.order_by('pub_date').first()
+        newest = Post.objects.order_by('pub_date').last()
+        self.assertGreater(newest.pub_date - oldest.pub_date, PERIOD / 2)
+        self.assertEqual(oldest.updated, oldest.pub_date)
+        self.assertEqual(set(reconcile_counters().values()), {0})
+        timeline = Timeline.objects.count()
+        self.assertEqual(rebuild_timelines(), timeline)
+        post = Post.objects.first()
+        self.assertTrue(
+            Post.objects.filter(
+                pk=post.pk, id__in=search_ids('post', post.text)
+            ).exists()
+        )
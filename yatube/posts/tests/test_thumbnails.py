@@ -0,0 +1,93 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.cache.config import build_caches
+
+from .. import thumbnails
+from ..models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    """Миниатюры создаются вне запроса, до тех пор виден оригинал."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='thumb_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_original_until_thumbnail_ready(self):
+        """Пока миниатюры нет, карточка показывает оригинал; после
+        генерации — миниатюру, а версия поста меняется.
+        """
+        post = Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.assertEqual(thumbnails.thumbnail_url(post.image), post.image.url)
+        url = reverse('posts:profile', args=(self.user.username,))
+        self.assertContains(self.client.get(url), post.image.url)
+
+        self.assertTrue(thumbnails.generate(post.image.name))
+        thumbnail = thumbnails.thumbnail_url(post.image)
+        self.assertNotEqual(thumbnail, post.image.url)
+        self.assertNotEqual(
+            Post.objects.get(pk=post.pk).updated, post.updated
+        )
+        self.assertContains(self.client.get(url), thumbnail)
+
+    @override_settings(
+        CACHES=build_caches(
+            'locmem://thumbs', 1, namespaces=('posts', 'thumbnails')
+        )
+    )
+    def test_attach_thumbnails_in_bulk(self):
+        """Миниатюры страницы ищутся одним запросом к базе, а при
+        повторе — без запросов вовсе.
+        """
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {number}',
+                image=SimpleUploadedFile(
+                    f'small_{number}.gif', SMALL_GIF, 'image/gif'
+                ),
+            )
+            for number in range(settings.CONST_TEN)
+        ]
+        thumbnails.generate(posts[0].image.name)
+        caches['thumbnails'].clear()
+        # Кеш в памяти: считаем только обращения к хранилищу sorl.
+        with self.assertNumQueries(1):
+            thumbnails.attach_thumbnails(posts)
+        with self.assertNumQueries(0):
+            thumbnails.attach_thumbnails(posts)
+        self.assertNotEqual(posts[0].thumb_url, posts[0].image.url)
+        self.assertEqual(posts[1].thumb_url, posts[1].image.url)
+
+    def test_missing_source_is_not_fatal(self):
+        """Отсутствующий файл не ломает генерацию."""
+        self.assertFalse(thumbnails.generate('posts/missing.jpg'))
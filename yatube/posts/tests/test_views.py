@@ -1,13 +1,26 @@
+import base64
+import json
 from http import HTTPStatus
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.cache.config import build_caches
+from core.testing import clear_caches
 
-from ..models import Comment, Follow, Group, Post
+from ..models import Comment, Follow, Group, Post, Timeline
+from ..counters import reconcile_counters
 from ..forms import CommentForm, PostForm
+from ..utils import FeedPaginator
 
 User = get_user_model()
 
@@ -159,6 +172,8 @@ class PaginatorViewsTest(TestCase):
             )
             for post in range(POSTS_COUNT)
         ]
+        Post.objects.bulk_create(cls.posts)
+        reconcile_counters()
         cls.follower = User.objects.create_user(
             username="test_follower",
         )
@@ -166,8 +181,6 @@ class PaginatorViewsTest(TestCase):
             user=cls.follower,
             author=cls.author,
         )
-
-        Post.objects.bulk_create(cls.posts)
         cls.all_pages_with_paginator = (
             ('posts:index', None),
             ('posts:group_list', (cls.group.slug,)),
@@ -198,6 +211,155 @@ class PaginatorViewsTest(TestCase):
                             len(response.context.get('page_obj')
                                 .object_list), count_posts)
 
+    def test_keyset_paginator_on_page(self):
+        """Пагинация по курсору проходит все посты без повторов
+        вперёд и возвращается назад на первую страницу.
+        """
+        for name, args in self.all_pages_with_paginator:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                first = self.follower_client.get(url + '?cursor=')
+                first_page = first.context['page_obj']
+                self.assertFalse(first_page.has_previous())
+                self.assertEqual(len(first_page), settings.CONST_TEN)
+                second = self.follower_client.get(
+                    f'{url}?cursor={first_page.next_cursor}'
+                )
+                second_page = second.context['page_obj']
+                self.assertFalse(second_page.has_next())
+                ids = [post.id for post in first_page]
+                ids += [post.id for post in second_page]
+                self.assertEqual(len(set(ids)), POSTS_COUNT)
+                back = self.follower_client.get(
+                    f'{url}?cursor={second_page.previous_cursor}'
+                )
+                self.assertEqual(
+                    [post.id for post in back.context['page_obj']],
+                    [post.id for post in first_page],
+                )
+
+    def test_malformed_cursor(self):
+        """Курсор правильной формы с негодными значениями ведёт на
+        первую страницу, а не к ошибке сервера.
+        """
+        cursors = [
+            ['n', ['abc', 1]],
+            ['p', ['2020-01-01T00:00:00+00:00', 'x']],
+            ['n', [None, 1]],
+            ['n', [[], {}]],
+        ]
+        for name, args in self.all_pages_with_paginator:
+            url = reverse(name, args=args)
+            first = self.follower_client.get(url + '?cursor=')
+            for cursor in cursors:
+                with self.subTest(name=name, cursor=cursor):
+                    raw = base64.urlsafe_b64encode(
+                        json.dumps(cursor).encode()
+                    ).decode()
+                    response = self.follower_client.get(
+                        url, {'cursor': raw}
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    self.assertEqual(
+                        [post.id for post in response.context['page_obj']],
+                        [post.id for post in first.context['page_obj']],
+                    )
+
+    def test_page_window(self):
+        """Вместо всех номеров страниц — первая, последняя и соседние
+        с текущей, пропуски отмечены None.
+        """
+        paginator = FeedPaginator(range(500), settings.CONST_TEN)
+        windows = (
+            (1, [1, 2, 3, None, 50]),
+            (5, [1, 2, 3, 4, 5, 6, 7, None, 50]),
+            (25, [1, None, 23, 24, 25, 26, 27, None, 50]),
+            (50, [1, None, 48, 49, 50]),
+        )
+        for number, window in windows:
+            with self.subTest(number=number):
+                self.assertEqual(paginator.page_window(number), window)
+        self.assertEqual(
+            FeedPaginator(range(80), settings.CONST_TEN).page_window(4),
+            list(range(1, 9)),
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].window, [1, 2])
+
+    def count_queries(self, url):
+        """(число постов ленты, сколько раз выполнен COUNT постов)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        counts = [
+            query for query in queries
+            if 'COUNT(*)' in query['sql'] and 'posts_post' in query['sql']
+        ]
+        return response.context['page_obj'].paginator.count, len(counts)
+
+    def test_cached_count(self):
+        """Число постов ленты берётся из кеша до нового поста."""
+        url = reverse('posts:index')
+        self.assertEqual(self.count_queries(url), (POSTS_COUNT, 1))
+        self.assertEqual(self.count_queries(url), (POSTS_COUNT, 0))
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.count_queries(url), (POSTS_COUNT + 1, 1))
+
+    def test_counter_count(self):
+        """Группа и профиль берут число постов из счётчиков."""
+        for url in (
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), (POSTS_COUNT, 0))
+        Post.objects.filter(author=self.author).first().delete()
+        self.assertEqual(
+            self.count_queries(reverse('posts:profile',
+                                       args=(self.author.username,))),
+            (POSTS_COUNT - 1, 0),
+        )
+
+    def test_edit_keeps_cached_count(self):
+        """Правка поста не сбрасывает закешированное число постов."""
+        url = reverse('posts:index')
+        self.count_queries(url)
+        post = Post.objects.first()
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.count_queries(url), (POSTS_COUNT, 0))
+
+    def test_counter_drift(self):
+        """Разошедшийся со лентой счётчик заменяется точным числом."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        for counter, page, expected in (
+            (POSTS_COUNT - 5, 1, settings.CONST_TEN),
+            (POSTS_COUNT + 20, 4, POSTS_COUNT - settings.CONST_TEN),
+        ):
+            with self.subTest(counter=counter):
+                Group.objects.filter(pk=self.group.pk).update(
+                    posts_count=counter
+                )
+                with self.assertLogs('posts.utils', 'WARNING'):
+                    response = self.client.get(url, {'page': page})
+                page_obj = response.context['page_obj']
+                self.assertEqual(page_obj.paginator.count, POSTS_COUNT)
+                self.assertEqual(len(page_obj), expected)
+
+    @override_settings(APPROXIMATE_COUNT_FROM=5, FEED_COUNT_ASYNC=False)
+    def test_approximate_count(self):
+        """Большая лента сразу получает прежнее число, пересчёт идёт
+        отдельно от запроса.
+        """
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Новый пост')
+        with self.settings(APPROXIMATE_COUNT_FROM=POSTS_COUNT + 1):
+            self.assertEqual(self.count_queries(url), (POSTS_COUNT + 1, 1))
+        Post.objects.create(author=self.author, text='Ещё пост')
+        count, _ = self.count_queries(url)
+        self.assertEqual(count, POSTS_COUNT + 1)
+        self.assertEqual(self.count_queries(url), (POSTS_COUNT + 2, 0))
+
 
 class TestComments(TestCase):
     @classmethod
@@ -251,6 +413,48 @@ class TestComments(TestCase):
         Comment.objects.first()
         self.assertEqual(Comment.objects.count(), 0)
 
+    def test_comments_pages(self):
+        """Комментарии выводятся страницами, следующие страницы
+        отдаёт фрагмент по курсору.
+        """
+        per_page = settings.COMMENTS_PER_PAGE
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.comment_user, text=f'№{i}.')
+            for i in range(per_page + 3)
+        )
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        response = self.client.get(url)
+        self.assertContains(response, f'№{per_page - 1}.')
+        self.assertNotContains(response, f'№{per_page}.')
+        fragment_url = reverse('posts:comments', args=(self.post.id,))
+        self.assertContains(response, f'{fragment_url}?cursor=')
+
+        first = self.client.get(fragment_url, {'format': 'json'}).json()
+        self.assertEqual(len(first['comments']), per_page)
+        rest = self.client.get(
+            fragment_url, {'cursor': first['next_cursor']}
+        )
+        self.assertContains(rest, f'№{per_page + 2}.')
+        self.assertNotContains(rest, '№0.')
+        self.assertNotContains(rest, 'Показать ещё')
+
+    def test_first_comments_page_cache(self):
+        """Первая страница комментариев берётся из кеша, пока не
+        изменятся комментарии поста.
+        """
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        Comment.objects.create(
+            post=self.post, author=self.comment_user, text='Первый'
+        )
+        self.client.get(url)
+        # Метки ETag (2), пост, дата последнего комментария и кеш.
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.comment_user, text='Второй'
+        )
+        self.assertContains(self.client.get(url), 'Второй')
+
 
 class TestCache(TestCase):
     @classmethod
@@ -296,6 +500,49 @@ class TestCache(TestCase):
         )
         self.assertNotEqual(response1.content, response3.content)
 
+    def test_post_card_cache(self):
+        """Карточка поста берётся из кеша, пока не изменится версия
+        поста, его группы или автора.
+        """
+        clear_caches()
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='скрытая правка')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'text')
+        self.assertNotContains(response, 'скрытая правка')
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'новый текст'
+        post.save()
+        self.assertContains(self.authorized_client.get(url), 'новый текст')
+
+        self.user.username = 'renamed_user'
+        self.user.save()
+        self.assertContains(self.authorized_client.get(url), '@renamed_user')
+
+        profile = reverse('posts:profile', args=(self.user.username,))
+        self.authorized_client.get(profile)
+        self.group.title = 'Новая группа'
+        self.group.save()
+        self.assertContains(
+            self.authorized_client.get(profile), 'Новая группа'
+        )
+
+    def test_user_save_without_rename(self):
+        """Сохранение пользователя без смены имени не трогает его
+        посты, смена имени — меняет их версию.
+        """
+        user = User.objects.get(pk=self.user.pk)
+        updated = Post.objects.get(pk=self.post.pk).updated
+        user.last_login = timezone.now()
+        user.save()
+        user.save(update_fields=['username'])
+        self.assertEqual(Post.objects.get(pk=self.post.pk).updated, updated)
+        user.first_name = 'Новое имя'
+        user.save()
+        self.assertGreater(Post.objects.get(pk=self.post.pk).updated, updated)
+
 
 class TestFollow(TestCase):
     @classmethod
@@ -411,3 +658,220 @@ class TestFollow(TestCase):
             'posts:profile_follow', args=(self.user.username,))
         )
         self.assertEqual(Follow.objects.all().count(), 1)
+
+    def test_unfollow_clears_timeline(self):
+        """Отписка убирает посты автора из ленты подписчика."""
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(self.follower.timeline.count(), 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.user.username,))
+        )
+        self.assertEqual(self.follower.timeline.count(), 0)
+
+    def test_follow_index_count(self):
+        """Число постов ленты подписок кешируется до нового поста
+        автора или смены подписок.
+        """
+        url = reverse('posts:follow_index')
+        Post.objects.create(author=self.user, text='Новый пост')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url)
+            counts = [
+                query for query in queries
+                if 'COUNT(*)' in query['sql'] and 'posts_post' in query['sql']
+            ]
+            return response.context['page_obj'].paginator.count, len(counts)
+
+        self.assertEqual(count_queries(), (1, 1))
+        self.assertEqual(count_queries(), (1, 0))
+        Post.objects.create(author=self.user, text='Ещё пост')
+        self.assertEqual(count_queries(), (2, 1))
+        Post.objects.filter(author=self.user).first().delete()
+        self.assertEqual(count_queries(), (1, 1))
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.user.username,))
+        )
+        self.assertEqual(count_queries(), (0, 1))
+
+    def test_rebuild_timelines(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Post.objects.create(author=self.user, text='Новый пост')
+        Timeline.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        response = self.authorized_client.get(
+            reverse('posts:follow_index')
+        )
+        self.assertEqual(len(response.context['page_obj']), 1)
+
+
+class TestStreaming(TestCase):
+    """Потоковый режим отдаёт те же страницы лент."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='stream_author')
+        cls.group = Group.objects.create(
+            title='Потоковая группа',
+            slug='stream_slug',
+            description='Описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Текст потока {i}.')
+            for i in range(POSTS_COUNT)
+        )
+        reconcile_counters()
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_streaming_matches_render(self):
+        """Шапка уходит первым куском, страница совпадает с обычной."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                expected = self.client.get(url).content.decode()
+                with self.settings(STREAMING_FEEDS=True):
+                    response = self.client.get(url + '?page=2')
+                    chunks = [
+                        chunk.decode() for chunk in response.streaming_content
+                    ]
+                    full = self.client.get(url)
+                    self.assertTrue(full.streaming)
+                    streamed = b''.join(full.streaming_content).decode()
+                self.assertIn('<header>', chunks[0])
+                self.assertNotIn('Текст потока', chunks[0])
+                self.assertIn('Текст потока 0.', ''.join(chunks))
+                self.assertEqual(
+                    ''.join(streamed.split()), ''.join(expected.split())
+                )
+
+    @override_settings(STREAMING_FEEDS=True)
+    def test_head_before_page(self):
+        """Шапка уходит до подсчёта и выборки постов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                chunks = iter(self.client.get(url).streaming_content)
+                with CaptureQueriesContext(connection) as queries:
+                    next(chunks)
+                self.assertFalse([
+                    query for query in queries
+                    if 'posts_post' in query['sql']
+                ])
+                self.assertIn('Текст потока', b''.join(chunks).decode())
+
+
+@override_settings(CACHES=build_caches(
+    'locmem://etag', 1, namespaces=('posts', 'users', 'thumbnails')
+))
+class TestConditionalGet(TestCase):
+    """Неизменившиеся страницы отвечают 304 без выборки постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='etag_slug',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        cls.urls = {
+            'group': reverse('posts:group_list', args=(cls.group.slug,)),
+            'profile': reverse('posts:profile', args=(cls.author.username,)),
+            'post': reverse('posts:post_detail', args=(cls.post.id,)),
+        }
+
+    def setUp(self):
+        clear_caches()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, etag):
+        # Вошедшему пользователю нужны только сессия и он сам.
+        with self.assertNumQueries(0 if client is self.client else 2):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304."""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                etag = response['ETag']
+                if name == 'post':
+                    # Автор поста ищется одним запросом по ключу.
+                    with self.assertNumQueries(1):
+                        response = self.client.get(
+                            url, HTTP_IF_NONE_MATCH=etag
+                        )
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+                else:
+                    self.assertNotModified(self.client, url, etag)
+
+    def test_user_aware_etag(self):
+        """У вошедшего пользователя свой ETag и нет Last-Modified."""
+        url = self.urls['profile']
+        anonymous = self.client.get(url)
+        response = self.reader_client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertNotModified(self.reader_client, url, response['ETag'])
+
+    def test_writes_change_etag(self):
+        """Пост, комментарий и подписка меняют ETag своих страниц."""
+        writes = (
+            (
+                ('group', 'profile'),
+                lambda: Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'
+                ),
+            ),
+            (
+                ('post',),
+                lambda: Comment.objects.create(
+                    author=self.reader, post=self.post, text='Да'
+                ),
+            ),
+            (
+                ('profile',),
+                lambda: Follow.objects.create(
+                    user=self.reader, author=self.author
+                ),
+            ),
+        )
+        for pages, write in writes:
+            etags = {
+                name: self.client.get(self.urls[name])['ETag']
+                for name in pages
+            }
+            write()
+            for name in pages:
+                with self.subTest(page=name):
+                    response = self.client.get(
+                        self.urls[name], HTTP_IF_NONE_MATCH=etags[name]
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_index_without_validators(self):
+        """Главная с кешем фрагмента не отдаёт валидаторы: иначе после
+        нового поста клиент получал бы 304 на устаревший HTML.
+        """
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
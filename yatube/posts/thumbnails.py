@@ -0,0 +1,162 @@
+"""Фоновая подготовка миниатюр изображений постов.
+
+Миниатюра создаётся после сохранения поста в пуле потоков, а страница
+лишь проверяет хранилище ключей sorl сразу для всех своих постов:
+пока миниатюры нет, выводится оригинал изображения.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, умеющий найти миниатюру, не создавая её."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Пустой ImageFile миниатюры с тем же именем, что у sorl."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища ключей или None."""
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        return default.kvstore.get(thumbnail)
+
+
+backend = PostThumbnailBackend()
+
+
+def generate(name):
+    """Создаёт миниатюру и обновляет версию карточек её постов."""
+    from . import freshness
+    from .models import Post
+
+    try:
+        thumbnail = backend.get_thumbnail(name, GEOMETRY, **OPTIONS)
+        if default.kvstore.get(thumbnail) is None:
+            return False
+        posts = Post.objects.filter(image=name)
+        posts.update(updated=timezone.now())
+        freshness.touch_posts(posts)
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+        return False
+
+
+def _run(job, name):
+    try:
+        return job(name)
+    finally:
+        connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def submit(job, name):
+    """Запускает ``job(name)`` после коммита транзакции: в пуле потоков
+    или, без THUMBNAIL_ASYNC, сразу.
+    """
+    if settings.THUMBNAIL_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_run, job, name)
+        )
+    else:
+        transaction.on_commit(lambda: job(name))
+
+
+def schedule(name):
+    """Ставит создание миниатюры в очередь после коммита транзакции."""
+    if name:
+        submit(generate, name)
+
+
+def _lookup(raw_keys):
+    """Какие ключи есть в хранилище sorl: один get_many к кешу
+    и один запрос к базе на промахи.
+    """
+    cache = default.kvstore.cache
+    found = cache.get_many(raw_keys)
+    misses = [key for key in raw_keys if key not in found]
+    if misses:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=misses).values_list(
+                'key', 'value'
+            )
+        )
+        fetched = {key: stored.get(key, EMPTY_VALUE) for key in misses}
+        cache.set_many(fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(fetched)
+    return {key for key, value in found.items() if value != EMPTY_VALUE}
+
+
+def thumbnail_urls(images):
+    """Словарь «имя изображения → URL» для набора изображений.
+
+    Для готовых миниатюр это их URL, для остальных — URL оригинала.
+    """
+    images = {image.name: image for image in images if image}
+    if not images:
+        return {}
+    thumbnails = {
+        name: backend.thumbnail_file(name, GEOMETRY, **OPTIONS)
+        for name in images
+    }
+    ready = _lookup([
+        add_prefix(thumbnail.key) for thumbnail in thumbnails.values()
+    ])
+    return {
+        name: (
+            thumbnails[name].url
+            if add_prefix(thumbnails[name].key) in ready else image.url
+        )
+        for name, image in images.items()
+    }
+
+
+def thumbnail_url(image):
+    """URL миниатюры, а пока её нет — URL оригинала."""
+    return thumbnail_urls([image]).get(image.name, '') if image else ''
+
+
+def attach_thumbnails(posts):
+    """Проставляет постам ``thumb_url`` одним обращением к хранилищу."""
+    urls = thumbnail_urls(post.image for post in posts)
+    for post in posts:
+        post.thumb_url = urls.get(post.image.name, '')
+    return posts
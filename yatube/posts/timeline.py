@@ -0,0 +1,94 @@
+from itertools import islice
+
+from django.db import connection
+
+from .bulk import chunked
+from .models import Follow, Post, Timeline
+
+BATCH_SIZE = 500
+
+
+def _bulk_insert(entries):
+    """Вставляет записи пачками, не собирая весь генератор в память."""
+    entries = iter(entries)
+    batch = list(islice(entries, BATCH_SIZE))
+    while batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, BATCH_SIZE))
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора;
+    возвращает id подписчиков.
+    """
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    _bulk_insert(
+        Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers
+    )
+    return followers
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту пользователя все посты автора."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    _bulk_insert(
+        Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+        for pk, pub_date in posts.iterator()
+    )
+
+
+def _fan_out_where(condition, params):
+    """Раскладывает посты по лентам подписчиков одним INSERT ... SELECT.
+
+    ``condition`` ограничивает пары подписка — пост автора.
+    """
+    sql = (
+        f'INSERT INTO {Timeline._meta.db_table} (user_id, post_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.pub_date '
+        f'FROM {Follow._meta.db_table} follow '
+        f'INNER JOIN {Post._meta.db_table} post '
+        f'ON post.author_id = follow.author_id '
+        f'WHERE {condition}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def add_follows(first_follow_id):
+    """Ленты подписок, созданных после ``first_follow_id``.
+
+    Для массовой загрузки: add_author на каждую подписку — это запрос
+    и вставка на подписку.
+    """
+    return _fan_out_where('follow.id > %s', [first_follow_id])
+
+
+def fan_out_posts(post_ids):
+    """Раскладывает по лентам подписчиков уже вставленные посты."""
+    total = 0
+    for chunk in chunked(post_ids, BATCH_SIZE):
+        placeholders = ', '.join(['%s'] * len(chunk))
+        total += _fan_out_where(f'post.id IN ({placeholders})', chunk)
+    return total
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild_timelines():
+    """Перестраивает все ленты по текущим подпискам."""
+    Timeline.objects.all().delete()
+    follows = Follow.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in follows.iterator():
+        add_author(user_id, author_id)
+    return Timeline.objects.count()
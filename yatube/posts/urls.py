@@ -12,6 +12,11 @@ urlpatterns = [
         name='group_list'
     ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path(
         'posts/<int:post_id>/',
         views.post_detail,
@@ -28,6 +33,11 @@ urlpatterns = [
         views.post_delete,
         name='post_delete'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
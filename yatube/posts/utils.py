@@ -1,9 +1,351 @@
+import base64
+import binascii
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import freshness
+
+COUNT_TIMEOUT = 60 * 60 * 24
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_refreshing = set()
+_refresh_lock = threading.Lock()
+
+
+class FeedPaginator(Paginator):
+    """Пагинатор ленты.
+
+    Вместо всех номеров страниц шаблон получает окно ``page.window``:
+    первую и последнюю страницы, соседние с текущей и None на месте
+    пропусков; класс страницы остаётся обычным Page.
+    """
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.window = self.page_window(page.number)
+        return page
+
+    def page_window(self, number, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг ``number``; None — пропуск.
+
+        Пропуск ставится, только если он заменяет хотя бы две страницы.
+        """
+        last = self.num_pages
+        if last <= (on_each_side + on_ends + 1) * 2:
+            return list(self.page_range)
+        if number > on_each_side + on_ends + 2:
+            window = [*range(1, on_ends + 1), None,
+                      *range(number - on_each_side, number + 1)]
+        else:
+            window = list(range(1, number + 1))
+        if number < last - on_each_side - on_ends - 1:
+            window += [*range(number + 1, number + on_each_side + 1), None,
+                       *range(last - on_ends + 1, last + 1)]
+        else:
+            window += range(number + 1, last + 1)
+        return window
+
+
+def _recount(paginator, version):
+    try:
+        paginator.store(paginator.exact_count(), version)
+    except Exception:
+        logger.exception('Не удалось пересчитать ленту %s', paginator.feed)
+    finally:
+        with _refresh_lock:
+            _refreshing.discard(paginator.feed)
+        if settings.FEED_COUNT_ASYNC:
+            connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='feed-counts'
+        )
+    return _executor
+
+
+class CachedCountPaginator(FeedPaginator):
+    """Пагинатор ленты без ``COUNT(*)`` на каждый запрос.
+
+    Источник числа постов выбирает представление:
+
+    * ``counter`` — денормализованный счётчик (``Group.posts_count``,
+      ``AuthorStats.posts_count``), который сигналы меняют при создании
+      и удалении поста; запросов нет вовсе. Счётчику доверяют не
+      слепо: последняя по нему страница выбирается с лишним постом, и
+      если постов больше или меньше, чем он обещал, число берётся из
+      кеша, как без счётчика (сам счётчик чинит reconcile_counters);
+    * иначе число хранится в кеше ``posts`` под ключом ленты вместе с
+      версией (posts.freshness.version), которая меняется при
+      создании и удалении постов ленты, и пересчитывается, когда
+      версия устарела;
+    * с ``approximate`` лента от ``APPROXIMATE_COUNT_FROM`` постов
+      получает прежнее число сразу, а пересчёт уходит в фоновый поток.
+      Число может отставать на несколько постов, зато запрос никогда
+      не ждёт подсчёта огромной ленты.
+    """
+
+    def __init__(self, object_list, per_page, feed, counter=None,
+                 approximate=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+        self.counter = counter
+        self.approximate = approximate
+
+    @cached_property
+    def version(self):
+        return freshness.version(self.feed)
+
+    @property
+    def cache_key(self):
+        return f'count:{self.feed}'
+
+    def exact_count(self):
+        return self.object_list.count()
+
+    def store(self, count, version):
+        caches['posts'].set(self.cache_key, (version, count), COUNT_TIMEOUT)
+
+    @cached_property
+    def count(self):
+        if self.counter is not None:
+            return self.counter
+        version, count = caches['posts'].get(self.cache_key, (None, None))
+        if count is not None and version == self.version:
+            return count
+        if (
+            count is not None and self.approximate
+            and count >= settings.APPROXIMATE_COUNT_FROM
+        ):
+            self.refresh()
+            return count
+        count = self.exact_count()
+        self.store(count, self.version)
+        return count
+
+    def page(self, number):
+        if self.counter is None:
+            return super().page(number)
+        number = self.validate_number(number)
+        if number < self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        posts = list(self.object_list[bottom:self.count + 1])
+        if len(posts) == self.count - bottom:
+            return self._get_page(posts, number, self)
+        logger.warning(
+            'Счётчик ленты %s разошёлся с числом постов', self.feed
+        )
+        self.counter = None
+        del self.count, self.num_pages
+        return super().page(min(number, self.num_pages))
+
+    def refresh(self):
+        """Пересчитывает ленту в фоне; один пересчёт на ленту сразу."""
+        with _refresh_lock:
+            if self.feed in _refreshing:
+                return
+            _refreshing.add(self.feed)
+        if settings.FEED_COUNT_ASYNC:
+            _get_executor().submit(_recount, self, self.version)
+        else:
+            _recount(self, self.version)
+
+
+class KeysetPage(Page):
+    """Страница пагинации по ключу.
+
+    Номера страницы и общего количества нет: страница знает только
+    курсоры на соседние страницы.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, cursor='',
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page cursor={self.cursor!r}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу сортировки (seek-пагинация).
+
+    Вместо ``COUNT(*)`` и ``OFFSET`` каждая страница выбирается
+    условием ``(pub_date, id) < (последний ключ)``, поэтому стоимость
+    запроса не зависит от глубины страницы. Курсор непрозрачен для
+    клиента: это base64 от направления и значений ключа.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-pk'), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = ordering
+
+    @staticmethod
+    def _field(name):
+        return name.lstrip('-')
+
+    def _key(self, obj):
+        return [
+            getattr(obj, self._field(name)) for name in self.ordering
+        ]
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in self._key(obj)
+        ]
+        raw = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _output_field(self, name):
+        """Поле модели или аннотации (ключ ленты подписок), по которому
+        проверяются значения курсора.
+        """
+        query = self.object_list.query
+        if name in query.annotations:
+            return query.annotations[name].output_field
+        meta = self.object_list.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, ключ) или None для первой страницы.
+
+        Значения ключа приводятся типами полей сортировки: курсор
+        правильной формы, но с чужими значениями тоже считается
+        некорректным.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(raw)
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        if direction not in ('n', 'p') or (
+            not isinstance(values, list)
+            or len(values) != len(self.ordering)
+        ):
+            return None
+        try:
+            values = [
+                self._output_field(self._field(name)).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if None in values:
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в порядке сортировки."""
+        condition = Q()
+        equal = Q()
+        for name, value in zip(self.ordering, values):
+            field = self._field(name)
+            descending = name.startswith('-') == forward
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору.
+
+        Некорректный курсор, как и пустой, ведёт на первую страницу.
+        """
+        decoded = self.decode_cursor(cursor)
+        forward = decoded is None or decoded[0] == 'n'
+        ordering = self.ordering if forward else [
+            self._reverse(name) for name in self.ordering
+        ]
+        queryset = self.object_list.order_by(*ordering)
+        if decoded is not None:
+            queryset = queryset.filter(self._seek(decoded[1], forward))
+        objects = list(queryset[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if not forward:
+            objects.reverse()
+        if not objects:
+            return KeysetPage(objects, self, cursor or '')
+        if forward:
+            has_next, has_previous = has_more, decoded is not None
+        else:
+            has_next, has_previous = True, has_more
+        return KeysetPage(
+            objects,
+            self,
+            cursor or '',
+            next_cursor=(
+                self.encode_cursor('n', objects[-1]) if has_next else None
+            ),
+            previous_cursor=(
+                self.encode_cursor('p', objects[0]) if has_previous else None
+            ),
+        )
+
+
+def paginator_posts(request, queryset, feed=None, counter=None,
+                    approximate=False):
+    """Описывает работу пагинатора постов.
 
+    Если в запросе передан ``cursor``, страница выбирается по ключу
+    сортировки (по умолчанию pub_date, id) без подсчёта общего
+    количества постов. Явная сортировка queryset становится ключом.
 
-def paginator_posts(request, queryset):
-    """Описывает работу пагинатора постов."""
-    paginator = Paginator(queryset, settings.CONST_TEN)
+    ``feed`` — ключ метки ленты (posts.freshness): число её постов
+    берёт CachedCountPaginator — из ``counter`` или из кеша до
+    следующего изменения ленты, с ``approximate`` — пересчитывая
+    огромную ленту в фоне. Без ``feed`` выполняется ``COUNT(*)``.
+    """
+    if 'cursor' in request.GET:
+        paginator = KeysetPaginator(
+            queryset,
+            settings.CONST_TEN,
+            ordering=queryset.query.order_by or ('-pub_date', '-pk'),
+        )
+        return paginator.get_page(request.GET.get('cursor'))
+    if feed is None:
+        paginator = FeedPaginator(queryset, settings.CONST_TEN)
+    else:
+        paginator = CachedCountPaginator(
+            queryset,
+            settings.CONST_TEN,
+            feed,
+            counter=counter,
+            approximate=approximate,
+        )
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,66 +1,158 @@
+from functools import partial
+
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from core.asgi import read_only
 
+from . import comments
+from .exporting import CONTENT_TYPES, export_lines, export_records
+from . import freshness
+from .freshness import (
+    author_keys, conditional_page, group_keys, post_page_keys
+)
 from .models import Follow, Group, Post, User, Comment
 from .forms import PostForm, CommentForm
+from .streaming import render_feed
+from .thumbnails import attach_thumbnails
 from .utils import paginator_posts
 
 
 # Главная страница -------------------------------------------------
+@read_only
 def index(request):
-    """Описывает работу главной страницы."""
+    """Описывает работу главной страницы.
+
+    Без ETag и Last-Modified: карточки главной кешируются фрагментом
+    на 30 секунд и могут отставать от меток ленты, а 304 закрепил бы
+    устаревший HTML у клиента до следующей записи.
+    """
     post_list = Post.objects.select_related('author', 'group').all()
-    context = {'page_obj': paginator_posts(request, post_list)}
-    return render(request, 'posts/index.html', context)
+    return render_feed(request, 'posts/index.html', {}, partial(
+        paginator_posts, request, post_list, 'index', approximate=True
+    ))
 
 
 # Страница групп ---------------------------------------------------
+@read_only
+@conditional_page(group_keys)
 def group_posts(request, slug):
     """Описывает работу страницы сообщества."""
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.select_related('author').all()
     context = {
         'group': group,
-        'page_obj': paginator_posts(request, post_list)
     }
-    return render(
-        request,
-        'posts/group_list.html',
-        context
-    )
+    return render_feed(request, 'posts/group_list.html', context, partial(
+        paginator_posts, request, post_list, f'group:{slug}',
+        counter=group.posts_count,
+    ))
 
 
 # Страница пользователя---------------------------------------------
+@read_only
+@conditional_page(author_keys)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
     post_list = author.posts.select_related('group').all()
+    stats = getattr(author, 'stats', None)
     following = request.user.is_authenticated and (
         author.following.filter(user=request.user).exists()
     )
     context = {
         'author': author,
-        'page_obj': paginator_posts(request, post_list),
         'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    return render_feed(request, 'posts/profile.html', context, partial(
+        paginator_posts, request, post_list, f'author:{username}',
+        counter=stats and stats.posts_count,
+    ))
+
+
+# Выгрузка постов пользователя -------------------------------------
+@login_required
+def profile_export(request, username):
+    """Посты автора с комментариями файлом JSONL или CSV; выгрузку
+    можно продолжить с поста после ``after``.
+    """
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        raise PermissionDenied
+    export_format = request.GET.get('format')
+    if export_format not in CONTENT_TYPES:
+        export_format = 'jsonl'
+    after = request.GET.get('after', '')
+    after = int(after) if after.isdigit() else None
+    response = StreamingHttpResponse(
+        export_lines(
+            export_records(author.posts.all(), after),
+            export_format,
+            header=after is None,
+        ),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}-posts.{export_format}"'
+    )
+    return response
 
 
 # Страница поста ---------------------------------------------------
+@read_only
+@conditional_page(post_page_keys)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.prefetch_related('comments__author'),
+        Post.objects.select_related('author__stats', 'group'),
         pk=post_id
     )
+    attach_thumbnails([post])
+    cursor = request.GET.get('comments')
+    if cursor:
+        comments_html = comments.render_page(
+            post.pk, comments.comments_page(post.pk, cursor)
+        )
+    else:
+        comments_html = comments.first_page_html(post)
 
     context = {
         'author': post.author,
         'post': post,
         'form': CommentForm(),
-        'comments': post.comments.all(),
+        'comments_html': comments_html,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+# Следующие страницы комментариев ----------------------------------
+@read_only
+@conditional_page(post_page_keys)
+def post_comments(request, post_id):
+    """Фрагмент HTML или JSON со страницей комментариев по курсору."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = comments.comments_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') != 'json':
+        return HttpResponse(comments.render_page(post_id, page))
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.pk,
+                'author': comment.author.username,
+                'text': comment.text,
+                'html': comment.html,
+                'pub_date': comment.pub_date.isoformat(),
+            }
+            for comment in page
+        ],
+        'next_cursor': page.next_cursor,
+    })
+
+
 # Страница создание поста ------------------------------------------
 @login_required
 def post_create(request):
@@ -147,13 +239,19 @@ def comment_delete(request, id):
 
 
 # страница follow --------------------------------------------------
+@read_only
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related('author').filter(
-        author__following__user=request.user
-    )
+    post_list = Post.objects.select_related('author', 'group').filter(
+        timelines__user=request.user
+    ).annotate(
+        feed_date=F('timelines__pub_date'),
+        feed_post=F('timelines__post'),
+    ).order_by('-feed_date', '-feed_post')
     context = {
-        'page_obj': paginator_posts(request, post_list),
+        'page_obj': paginator_posts(
+            request, post_list, freshness.follow_feed_key(request.user.pk)
+        ),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -174,5 +272,9 @@ def profile_follow(request, username):
 # Отписаться на автора----------------------------------------------
 @login_required
 def profile_unfollow(request, username):
-    get_object_or_404(Follow, author__username=username).delete()
+    get_object_or_404(
+        Follow,
+        user=request.user,
+        author__username=username
+    ).delete()
     return redirect('posts:profile', username=username)
@@ -0,0 +1,19 @@
+from .engine import search_ids
+
+
+class IndexedSearchMixin:
+    """Поиск в админке через поисковый индекс вместо ``LIKE '%q%'``.
+
+    ``search_fields`` остаётся заданным, чтобы админка показывала поле
+    поиска; запрос без значимых слов обрабатывается стандартно.
+    """
+
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        ids = search_ids(self.search_kind, search_term)
+        if ids is None:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=ids), False
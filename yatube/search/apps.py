@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    name = 'search'
+    verbose_name = 'Поиск'
+
+    def ready(self):
+        from . import signals  # noqa: F401
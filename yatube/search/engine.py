@@ -0,0 +1,205 @@
+"""Поисковые движки по постам и комментариям.
+
+Оба движка хранят основы слов из ``search.text`` и отвечают на запрос
+подзапросом ``id`` подходящих объектов, который подставляется в
+``pk__in``. Найденными считаются объекты, содержащие все термины
+запроса.
+"""
+from abc import ABC, abstractmethod
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+from .models import Posting
+from .text import terms
+
+KINDS = ('post', 'comment')
+
+
+def fts_table(kind):
+    return f'search_{kind}_fts'
+
+
+class BaseEngine(ABC):
+    """Общий интерфейс движков.
+
+    ``add`` добавляет пары (id, текст) без проверки дублей, ``index``
+    заменяет запись одного объекта, ``remove_many`` одним запросом
+    убирает объекты из подзапроса id (queryset ``values('pk')``).
+    """
+
+    name = None
+
+    @abstractmethod
+    def add(self, kind, rows):
+        """Добавляет в индекс пары (id, текст)."""
+
+    @abstractmethod
+    def remove(self, kind, object_id):
+        """Убирает объект из индекса."""
+
+    @abstractmethod
+    def remove_many(self, kind, ids):
+        """Убирает объекты из подзапроса ``ids``."""
+
+    @abstractmethod
+    def clear(self, kind):
+        """Очищает индекс объектов ``kind``."""
+
+    @abstractmethod
+    def matching(self, kind, query_terms):
+        """Подзапрос id объектов, содержащих все термины."""
+
+    def index(self, kind, object_id, text):
+        self.remove(kind, object_id)
+        self.add(kind, [(object_id, text)])
+
+
+class PostingEngine(BaseEngine):
+    """Инвертированный индекс в обычной таблице ``search_posting``."""
+
+    name = 'postings'
+
+    def add(self, kind, rows):
+        Posting.objects.bulk_create(
+            (
+                Posting(term=term, kind=kind, object_id=object_id)
+                for object_id, text in rows
+                for term in set(terms(text))
+            ),
+            batch_size=500,
+        )
+
+    def remove(self, kind, object_id):
+        Posting.objects.filter(kind=kind, object_id=object_id).delete()
+
+    def remove_many(self, kind, ids):
+        Posting.objects.filter(kind=kind, object_id__in=ids).delete()
+
+    def clear(self, kind):
+        Posting.objects.filter(kind=kind).delete()
+
+    def matching(self, kind, query_terms):
+        query_terms = set(query_terms)
+        return Posting.objects.filter(
+            kind=kind, term__in=query_terms
+        ).values('object_id').annotate(
+            found=Count('term')
+        ).filter(found=len(query_terms)).values('object_id')
+
+
+class Fts5Engine(BaseEngine):
+    """Полнотекстовые таблицы SQLite FTS5, ``rowid`` — id объекта.
+
+    В таблицу пишутся уже нормализованные термины, поэтому стандартный
+    токенизатор FTS5 лишь делит их по пробелам.
+    """
+
+    name = 'fts5'
+
+    def add(self, kind, rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {fts_table(kind)} (rowid, body) VALUES (%s, %s)',
+                [
+                    (object_id, ' '.join(terms(text)))
+                    for object_id, text in rows
+                ],
+            )
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {fts_table(kind)} WHERE rowid = %s',
+                [object_id],
+            )
+
+    def remove_many(self, kind, ids):
+        sql, params = ids.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {fts_table(kind)} WHERE rowid IN ({sql})',
+                params,
+            )
+
+    def clear(self, kind):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {fts_table(kind)}')
+
+    def matching(self, kind, query_terms):
+        match = ' '.join(
+            '"{}"'.format(term.replace('"', '""')) for term in query_terms
+        )
+        table = fts_table(kind)
+        return MatchIds(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (match,)
+        )
+
+
+class MatchIds(RawSQL):
+    """Сырой подзапрос id для ``pk__in``.
+
+    RawSQL сам берёт запрос в скобки, и lookup ``in`` добавляет вторые:
+    ``IN ((SELECT ...))`` SQLite читает как скаляр — первую строку.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+ENGINES = {engine.name: engine for engine in (PostingEngine, Fts5Engine)}
+_fts_available = {}
+
+
+def fts_available():
+    """Созданы ли таблицы FTS5 в текущей базе."""
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _fts_available:
+        with connection.cursor() as cursor:
+            tables = connection.introspection.table_names(cursor)
+        _fts_available[key] = all(fts_table(kind) in tables for kind in KINDS)
+    return _fts_available[key]
+
+
+def get_engine():
+    """Движок из ``settings.SEARCH_ENGINE``; ``auto`` выбирает FTS5,
+    если он доступен.
+    """
+    name = settings.SEARCH_ENGINE
+    if name == 'auto':
+        name = Fts5Engine.name if fts_available() else PostingEngine.name
+    return ENGINES[name]()
+
+
+def search_ids(kind, query):
+    """Подзапрос id объектов, подходящих под запрос, или None, если
+    в запросе нет ни одного значимого слова.
+    """
+    query_terms = terms(query)
+    if not query_terms:
+        return None
+    return get_engine().matching(kind, query_terms)
+
+
+def rebuild(kind, queryset, chunk_size=500):
+    """Заново индексирует все объекты; возвращает их количество."""
+    get_engine().clear(kind)
+    return index_all(kind, queryset, chunk_size)
+
+
+def index_all(kind, queryset, chunk_size=500):
+    """Добавляет объекты queryset в индекс; возвращает их количество."""
+    engine = get_engine()
+    rows = queryset.order_by().values_list('pk', 'text').iterator(
+        chunk_size=chunk_size
+    )
+    count = 0
+    chunk = list(islice(rows, chunk_size))
+    while chunk:
+        engine.add(kind, chunk)
+        count += len(chunk)
+        chunk = list(islice(rows, chunk_size))
+    return count
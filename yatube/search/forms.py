@@ -0,0 +1,14 @@
+from django import forms
+
+
+class SearchForm(forms.Form):
+    """Форма поиска по постам и комментариям."""
+
+    q = forms.CharField(
+        label='Поиск',
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(
+            attrs={'type': 'search', 'placeholder': 'Что ищем?'}
+        ),
+    )
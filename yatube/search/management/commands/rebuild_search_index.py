@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Comment, Post
+from search.engine import get_engine, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс постов и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Сколько объектов индексировать за одну вставку.',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts = rebuild('post', Post.objects.all(), options['chunk_size'])
+            comments = rebuild(
+                'comment', Comment.objects.all(), options['chunk_size']
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Движок {get_engine().name}: постов {posts}, '
+            f'комментариев {comments}'
+        ))
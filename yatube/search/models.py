@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class Posting(models.Model):
+    """Запись инвертированного индекса: термин встречается в объекте.
+
+    Используется, когда SQLite собран без FTS5 или база не SQLite.
+    """
+
+    term = models.CharField('Термин', max_length=64)
+    kind = models.CharField('Тип объекта', max_length=16)
+    object_id = models.PositiveIntegerField('ID объекта')
+
+    class Meta:
+        verbose_name = 'Запись индекса'
+        verbose_name_plural = 'Записи индекса'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('kind', 'term', 'object_id'),
+                name='unique_posting'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('kind', 'object_id'), name='posting_object_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} → {self.kind}:{self.object_id}'
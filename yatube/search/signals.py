@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from posts import deleting
+from posts.models import Comment, Post, User
+
+from .engine import get_engine
+
+KINDS = {Post: 'post', Comment: 'comment'}
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def indexed_saved(sender, instance, raw=False, **kwargs):
+    """Сохранённый текст сразу попадает в поисковый индекс."""
+    update_fields = kwargs.get('update_fields')
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    get_engine().index(KINDS[sender], instance.pk, instance.text)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Комментарии удаляемого поста убираются из индекса одним
+    запросом, а не по одному в post_delete каждого.
+    """
+    get_engine().remove_many(
+        'comment', Comment.objects.filter(post=instance).values('pk')
+    )
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    """Посты и комментарии удаляемого пользователя убираются из
+    индекса двумя запросами. Комментарии к его постам уже убраны
+    post_deleting: pre_delete постов приходит раньше.
+    """
+    deleting.begin(instance)
+    engine = get_engine()
+    engine.remove_many(
+        'post', Post.objects.filter(author=instance).values('pk')
+    )
+    engine.remove_many(
+        'comment', Comment.objects.filter(author=instance).values('pk')
+    )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    deleting.end(instance)
+
+
+def _removed_with_parent(sender, instance):
+    """Запись уже убрана обработчиком pre_delete поста или автора."""
+    if deleting.in_progress(User, instance.author_id):
+        return True
+    return sender is Comment and deleting.in_progress(Post, instance.post_id)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def indexed_deleted(sender, instance, **kwargs):
+    """Удалённый объект убирается из поискового индекса."""
+    if not _removed_with_parent(sender, instance):
+        get_engine().remove(KINDS[sender], instance.pk)
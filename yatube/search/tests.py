@@ -0,0 +1,186 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.testing import clear_caches
+from posts.models import Comment, Post
+
+from .engine import fts_available, fts_table, get_engine
+from .models import Posting
+from .text import stem, terms
+
+User = get_user_model()
+
+
+class TextTest(TestCase):
+    def test_stem(self):
+        """Формы слова приводятся к одной основе."""
+        for forms in (
+            ('кошка', 'кошки', 'кошкам', 'кошкой'),
+            ('красивый', 'красивая', 'красивейший'),
+            ('бежали', 'бежать'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+    def test_terms(self):
+        """Стоп-слова отбрасываются, «ё» равна «е», латиница не
+        стеммится.
+        """
+        self.assertEqual(
+            terms('Ёжики и Django'), [stem('ежики'), 'django']
+        )
+
+
+class SearchMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки гуляют по крыше'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.user, text='Собаки лают во дворе'
+        )
+        Comment.objects.create(
+            author=cls.user, post=cls.dogs, text='Рыжая кошка смотрит'
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def found(self, query):
+        response = self.client.get(reverse('search:search'), {'q': query})
+        return {post.pk for post in response.context['page_obj']}
+
+    def test_search_by_word_forms(self):
+        """Пост находится по другой форме слова и по комментарию."""
+        self.assertEqual(self.found('кошкой'), {self.cats.pk, self.dogs.pk})
+        self.assertEqual(self.found('собаками лают'), {self.dogs.pk})
+        self.assertEqual(self.found('рыжие кошки'), {self.dogs.pk})
+        self.assertEqual(self.found('и'), set())
+
+    def test_index_follows_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Коты спят'
+        post.save()
+        self.assertEqual(self.found('крыша'), set())
+        self.assertEqual(self.found('коты'), {post.pk})
+        Post.objects.filter(pk=self.dogs.pk).delete()
+        self.assertEqual(self.found('собака'), set())
+
+    def test_admin_search(self):
+        """Поиск в админке идёт через индекс."""
+        request = RequestFactory().get('/')
+        model_admin = site._registry[Comment]
+        queryset, distinct = model_admin.get_search_results(
+            request, Comment.objects.all(), 'рыжий'
+        )
+        self.assertEqual(queryset.count(), 1)
+        self.assertFalse(distinct)
+
+    def test_cascade_delete(self):
+        """Каскадное удаление убирает записи индекса запросом на
+        родителя, а не на каждый комментарий.
+        """
+        leaving = User.objects.create_user(username='leaving')
+        post = Post.objects.create(author=leaving, text='Уходящий пост')
+        comments = [
+            Comment.objects.create(
+                author=self.user, post=post, text=f'Ответ {number}'
+            )
+            for number in range(4)
+        ]
+        own = Comment.objects.create(
+            author=leaving, post=self.cats, text='Прощальный ответ'
+        )
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        index_deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE') and 'search_' in query['sql']
+        ]
+        self.assertEqual(len(index_deletes), 2)
+        self.assertFalse(
+            {comment.pk for comment in comments}
+            & self.indexed_ids('comment')
+        )
+        other = Post.objects.create(author=leaving, text='Второй пост')
+        leaving.delete()
+        self.assertNotIn(other.pk, self.indexed_ids('post'))
+        self.assertNotIn(own.pk, self.indexed_ids('comment'))
+        self.assertIn(self.cats.pk, self.indexed_ids('post'))
+
+    def test_migration_fill_index(self):
+        """Миграция заполняет индекс пачками."""
+        initial = import_module('search.migrations.0001_initial')
+        engine = get_engine()
+        for kind in ('post', 'comment'):
+            engine.clear(kind)
+        with mock.patch.object(initial, 'BATCH_SIZE', 1), mock.patch.object(
+            initial, 'has_fts5', return_value=engine.name == 'fts5'
+        ):
+            initial.fill_index(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(
+            self.indexed_ids('post'),
+            set(Post.objects.values_list('pk', flat=True)),
+        )
+        self.assertEqual(
+            self.indexed_ids('comment'),
+            set(Comment.objects.values_list('pk', flat=True)),
+        )
+        self.assertEqual(self.found('рыжие кошки'), {self.dogs.pk})
+
+    def test_rebuild_command(self):
+        """bulk_create минует сигналы, команда индексирует всё заново."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пингвин номер {i}')
+            for i in range(12)
+        )
+        self.assertEqual(self.found('пингвины'), set())
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(
+            reverse('search:search'), {'q': 'пингвины'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, 'q=%D0%BF%D0%B8')
+
+
+@override_settings(SEARCH_ENGINE='postings')
+class PostingSearchTest(SearchMixin, TestCase):
+    """Поиск по инвертированному индексу в таблице."""
+
+    def indexed_ids(self, kind):
+        return set(
+            Posting.objects.filter(kind=kind).values_list(
+                'object_id', flat=True
+            )
+        )
+
+
+@override_settings(SEARCH_ENGINE='fts5')
+class Fts5SearchTest(SearchMixin, TestCase):
+    """Поиск через SQLite FTS5."""
+
+    @classmethod
+    def setUpClass(cls):
+        if not fts_available():
+            cls.skipTest(cls, 'SQLite собран без FTS5')
+        super().setUpClass()
+
+    def indexed_ids(self, kind):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {fts_table(kind)}')
+            return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,147 @@
+"""Токенизация и стемминг текста для поискового индекса.
+
+Кириллические слова проходят через стеммер Портера для русского языка
+(алгоритм Snowball), остальные слова только приводятся к нижнему
+регистру.
+"""
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+MAX_TERM_LENGTH = 64
+
+VOWELS = frozenset('аеиоуыэюя')
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'все', 'да', 'для', 'до', 'же',
+    'за', 'и', 'из', 'или', 'к', 'как', 'ко', 'ли', 'на', 'над', 'не',
+    'ни', 'но', 'о', 'об', 'от', 'по', 'под', 'при', 'с', 'со', 'так',
+    'то', 'у', 'что', 'это',
+))
+
+
+def _by_length(*endings):
+    return tuple(sorted(endings, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND = (
+    _by_length('в', 'вши', 'вшись'),
+    _by_length('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _by_length(
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    _by_length('ем', 'нн', 'вш', 'ющ', 'щ'),
+    _by_length('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = _by_length('ся', 'сь')
+VERB = (
+    _by_length(
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    _by_length(
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = _by_length(
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = _by_length('ейш', 'ейше')
+DERIVATIONAL = _by_length('ост', 'ость')
+
+
+def _region(word, start):
+    """Начало области после первой пары «гласная, согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip(word, start, endings, after_a=False):
+    """Отрезает самое длинное окончание, лежащее в word[start:].
+
+    Окончания первой группы (after_a) допустимы только после «а» или «я».
+    """
+    for ending in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if after_a and (cut - 1 < start or word[cut - 1] not in 'ая'):
+            continue
+        return word[:cut]
+    return None
+
+
+def _strip_grouped(word, start, groups):
+    first, second = groups
+    result = _strip(word, start, first, after_a=True)
+    candidate = _strip(word, start, second)
+    if candidate is not None and (
+        result is None or len(candidate) < len(result)
+    ):
+        return candidate
+    return result
+
+
+def _step1(word, rv):
+    stripped = _strip_grouped(word, rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    word = _strip(word, rv, REFLEXIVE) or word
+    adjective = _strip(word, rv, ADJECTIVE)
+    if adjective is not None:
+        participle = _strip_grouped(adjective, rv, PARTICIPLE)
+        return adjective if participle is None else participle
+    for stripped in (
+        _strip_grouped(word, rv, VERB),
+        _strip(word, rv, NOUN),
+    ):
+        if stripped is not None:
+            return stripped
+    return word
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball."""
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r2 = _region(word, _region(word, 0))
+    word = _step1(word, rv)
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _strip(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн'):
+        return word[:-1]
+    superlative = _strip(word, rv, SUPERLATIVE)
+    if superlative is not None:
+        word = superlative
+        return word[:-1] if word.endswith('нн') else word
+    if word.endswith('ь'):
+        return word[:-1]
+    return word
+
+
+def terms(text):
+    """Список поисковых терминов текста в порядке появления."""
+    result = []
+    for token in TOKEN_RE.findall(text.lower().replace('ё', 'е')):
+        if token in STOP_WORDS:
+            continue
+        if CYRILLIC_RE.search(token):
+            token = stem(token)
+        if token:
+            result.append(token[:MAX_TERM_LENGTH])
+    return result
@@ -0,0 +1,34 @@
+from django.db.models import Q
+from django.shortcuts import render
+
+from core.asgi import read_only
+from posts.models import Comment, Post
+from posts.utils import paginator_posts
+
+from .engine import search_ids
+from .forms import SearchForm
+
+
+# Страница поиска --------------------------------------------------
+@read_only
+def search(request):
+    """Посты, в тексте которых или в комментариях к которым есть все
+    слова запроса. Без значимых слов страница пуста.
+    """
+    form = SearchForm(request.GET)
+    query = form.cleaned_data['q'] if form.is_valid() else ''
+    post_list = Post.objects.none()
+    post_ids = search_ids('post', query)
+    if post_ids is not None:
+        commented = Comment.objects.filter(
+            pk__in=search_ids('comment', query)
+        ).values('post_id')
+        post_list = Post.objects.select_related('author', 'group').filter(
+            Q(pk__in=post_ids) | Q(pk__in=commented)
+        )
+    context = {
+        'form': form,
+        'query': query,
+        'page_obj': paginator_posts(request, post_list),
+    }
+    return render(request, 'search/search.html', context)
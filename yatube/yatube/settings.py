@@ -1,5 +1,8 @@
 import os
 
+from core.cache.config import build_caches
+from core.sqlite import database_settings
+from core.templating import template_loaders
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -20,6 +23,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'search.apps.SearchConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -29,25 +33,34 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Кеширующий загрузчик шаблонов (core/templating.py): шаблоны
+# компилируются один раз на процесс и прогреваются при старте. При
+# DEBUG по умолчанию выключен, чтобы правки шаблонов были видны сразу.
+TEMPLATE_CACHE = os.getenv(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1'
+) == '1'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [
             os.path.join(BASE_DIR, 'templates')
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders(TEMPLATE_CACHE),
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -61,13 +74,44 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
+# Профиль SQLite (core/sqlite.py): tuned — WAL, synchronous=NORMAL,
+# mmap, кеш страниц, ожидание блокировок и постоянные соединения;
+# django — настройки Django по умолчанию.
+DATABASE_PROFILE = os.getenv('YATUBE_DB_PROFILE', 'tuned')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **database_settings(DATABASE_PROFILE),
     }
 }
 
+# Реплики только для чтения: пути к файлам SQLite через запятую.
+# Локально их наполняет команда sync_replicas. Тесты запускаются без
+# реплик, маршрутизацию проверяет core.tests.
+DATABASE_REPLICAS = []
+
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+        **database_settings(DATABASE_PROFILE),
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+
+# Сколько секунд после записи пользователь читает с основной базы.
+DATABASE_PIN_SECONDS = 10
+
+# Наибольшее ожидаемое отставание реплик в секундах: страницы с ETag,
+# изменённые позже, читаются с основной базы.
+DATABASE_REPLICA_LAG = 5
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -120,8 +164,77 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Общий для всех воркеров кеш. Схемы: db://<таблица> (по умолчанию;
+# у пространств имён таблицы <таблица>_<имя>), file:///<каталог>,
+# redis://host:port/db, locmem://<имя>. Таблицы кеша не входят в
+# миграции: их создаёт createcachetable, который core запускает после
+# каждого migrate. Смена YATUBE_CACHE_VERSION сбрасывает весь кеш.
+CACHE_URL = os.getenv('YATUBE_CACHE_URL', 'db://yatube_cache')
+
+CACHE_VERSION = int(os.getenv('YATUBE_CACHE_VERSION', '1'))
+
+CACHES = build_caches(
+    CACHE_URL,
+    CACHE_VERSION,
+    namespaces=('posts', 'users', 'thumbnails', 'metrics'),
+)
+
+THUMBNAIL_CACHE = 'thumbnails'
+
+# Миниатюры создаются в фоне пулом из THUMBNAIL_WORKERS потоков.
+THUMBNAIL_ASYNC = True
+
+THUMBNAIL_WORKERS = 2
+
+# Загруженные изображения (posts/images.py) в том же пуле уменьшаются
+# до IMAGE_MAX_SIDE по большей стороне и перекодируются без EXIF в
+# IMAGE_FORMAT: JPEG (прогрессивный) или WEBP, если Pillow его умеет.
+IMAGE_INGEST = True
+
+IMAGE_MAX_SIDE = 1920
+
+IMAGE_FORMAT = os.getenv('YATUBE_IMAGE_FORMAT', 'JPEG')
+
+IMAGE_QUALITY = 82
+
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Поисковый движок: fts5, postings или auto — FTS5, если его таблицы
+# созданы миграцией search. После смены движка нужна команда
+# rebuild_search_index.
+SEARCH_ENGINE = os.getenv('YATUBE_SEARCH_ENGINE', 'auto')
+
+# Пулы потоков ASGI-входа (yatube/asgi.py): общий и для представлений
+# @read_only. Соединения клиентов потоков не занимают.
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', '8'))
+
+ASGI_READ_THREADS = int(os.getenv('YATUBE_ASGI_READ_THREADS', '16'))
+
+# Комментарии на странице поста. Первая страница кешируется отдельно
+# от поста; ключ меняется при добавлении и удалении комментария.
+COMMENTS_PER_PAGE = 20
+
+COMMENTS_CACHE_TIMEOUT = 60 * 10
+
+# Число постов ленты для пагинатора (posts/utils.py): лента с
+# approximate от APPROXIMATE_COUNT_FROM постов показывает прежнее число
+# из кеша, пока FEED_COUNT_ASYNC пересчитывает его в фоне.
+APPROXIMATE_COUNT_FROM = 10000
+
+FEED_COUNT_ASYNC = True
+
+# Потоковая отдача лент (index, group_posts, profile): шапка страницы
+# уходит до выборки постов, карточки — пачками по STREAMING_CHUNK_SIZE.
+STREAMING_FEEDS = os.getenv('YATUBE_STREAMING_FEEDS', '') == '1'
+
+STREAMING_CHUNK_SIZE = 5
+
+# Доля запросов, для которых MetricsMiddleware считает запросы к базе,
+# время шаблонов и кеш (core/metrics.py); 0 выключает замеры.
+METRICS_SAMPLE_RATE = float(os.getenv('YATUBE_METRICS_SAMPLE_RATE', '0.1'))
+
+# Гистограммы всех воркеров суммируются в этом кеше; воркер переносит
+# туда свои замеры не реже раза в METRICS_FLUSH_SECONDS секунд.
+METRICS_CACHE = 'metrics'
+
+METRICS_FLUSH_SECONDS = 10